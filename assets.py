@@ -0,0 +1,66 @@
+from functools import lru_cache
+from pathlib import Path
+import base64
+import io
+import streamlit as st
+
+# Images from img/ are read, resized and encoded once per file version (keyed
+# by mtime) instead of on every rerun. With server.enableStaticServing the
+# resized variants are written to static/ and referenced by URL, so reruns
+# send a short <img src> instead of the whole base64 payload.
+IMG_DIR = Path(__file__).parent / "img"
+STATIC_DIR = Path(__file__).parent / "static"
+# Variants are rendered at twice the display width so they stay sharp on HiDPI.
+ASSET_SCALE = 2
+
+def _resize(data, width):
+    try:
+        from PIL import Image
+    except ImportError:
+        return data
+
+    image = Image.open(io.BytesIO(data))
+    if image.width <= width:
+        return data
+    height = round(image.height * width / image.width)
+    out = io.BytesIO()
+    image.resize((width, height), Image.LANCZOS).save(out, format="PNG", optimize=True)
+    return out.getvalue() if out.tell() < len(data) else data
+
+@lru_cache(maxsize=64)
+def _variant(path, mtime, width):
+    data = Path(path).read_bytes()
+    return _resize(data, width * ASSET_SCALE) if width else data
+
+@lru_cache(maxsize=64)
+def _data_uri(path, mtime, width):
+    return "data:image/png;base64," + base64.b64encode(_variant(path, mtime, width)).decode()
+
+def _static_url(path, mtime, width):
+    filename = f"{path.stem}-{width or 'full'}-{mtime}.png"
+    target = STATIC_DIR / filename
+    if not target.exists():
+        STATIC_DIR.mkdir(exist_ok=True)
+        tmp = target.with_suffix(".tmp")
+        tmp.write_bytes(_variant(str(path), mtime, width))
+        tmp.replace(target)
+    return f"app/static/{filename}"
+
+def data_uri(path, width=None):
+    path = Path(path)
+    return _data_uri(str(path), path.stat().st_mtime_ns, width)
+
+def asset_src(name, width=None):
+    # <img src> for img/<name>, resized for the given display width.
+    path = IMG_DIR / name
+    mtime = path.stat().st_mtime_ns
+    if st.get_option("server.enableStaticServing"):
+        return _static_url(path, mtime, width)
+    return _data_uri(str(path), mtime, width)
+
+@st.cache_resource
+def preload_assets(widths):
+    # widths: {filename: display width}; runs once per process.
+    for name, width in widths.items():
+        asset_src(name, width)
+    return True
@@ -0,0 +1,287 @@
+from pathlib import Path
+from statistics import median
+import argparse
+import datetime
+import json
+import os
+import platform
+import resource
+import shutil
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import tracemalloc
+import numpy as np
+import pandas as pd
+
+# Times the load -> score -> render pipeline on synthetic survey data:
+#   python benchmarks/bench_pipeline.py --sizes 10000 100000 1000000 --output after.json
+#   python benchmarks/bench_pipeline.py --sizes 10000 --compare before.json
+# Each stage is run once "cold" (caches and disk cache cleared first) and
+# --repeat times "warm"; peak Python heap (tracemalloc) is taken from a
+# separate cold run so it does not skew the timings. Workbooks are served by
+# the local data source, or over HTTP by gas_stub.py with --http.
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+
+YEAR = '2025'
+EVENT = 'Nataru'
+XLSX_MAX_ROWS = 1048575  # per sheet, plus the header row
+CITIES = ['Jakarta', 'Bogor', 'Depok', 'Tangerang', 'Bekasi', 'Bandung', 'Serang', 'Cirebon', 'Karawang',
+          'Sukabumi', 'Semarang', 'Surabaya', 'Yogyakarta', 'Solo', 'Malang', 'Lampung', 'Palembang', 'Medan',
+          'Pekanbaru', 'Padang', 'Pontianak', 'Balikpapan', 'Makassar', 'Denpasar', 'Mataram']
+WORDS = ['antri', 'panjang', 'bersih', 'mahal', 'wahana', 'seru', 'parkir', 'toilet', 'ramah', 'petugas',
+         'makanan', 'tiket', 'pantai', 'anak', 'keluarga', 'panas', 'nyaman', 'ramai', 'murah', 'kotor']
+
+def synthetic_unit(rng, n, cli_max=10):
+    words = np.array(WORDS, dtype=object)
+    alasan = words[rng.integers(0, len(words), n)]
+    for _ in range(3):
+        alasan = alasan + ' ' + words[rng.integers(0, len(words), n)]
+    csi = rng.integers(1, 6, n).astype(float)
+    csi[rng.random(n) < 0.01] = np.nan
+    return pd.DataFrame({
+        'CSI': csi,
+        'CLI': rng.integers(1, cli_max + 1, n),
+        'NPS': rng.integers(0, 11, n),
+        'Sentiment': rng.choice(['Positive', 'Neutral', 'Negative'], n, p=[0.6, 0.25, 0.15]),
+        'Domisili': rng.choice(CITIES, n),
+        'Usia': rng.choice(['<18', '18-25', '26-35', '36-45', '>45'], n),
+        'Companions': rng.choice(['Family', 'Friends', 'Alone', 'Partner'], n),
+        'Alasan': alasan,
+    })
+
+def synthetic_workbook(rng, respondents, units):
+    sizes = np.full(len(units), respondents // len(units))
+    sizes[:respondents % len(units)] += 1
+    return {unit: synthetic_unit(rng, int(n), 5 if unit == 'Samudra' else 10) for unit, n in zip(units, sizes)}
+
+def synthetic_archive(rng, periods, events, units):
+    # periods years of every event for every unit, oldest first.
+    first_year = int(YEAR) - periods + 1
+    rows1, rows2 = [], []
+    for year in range(first_year, int(YEAR) + 1):
+        for event in events:
+            for unit in units:
+                rows1.append({'Tahun': year, 'Event': event, 'Unit': unit, 'CSI': rng.uniform(70, 95),
+                              'CLI': rng.uniform(60, 90), 'NPS': rng.uniform(10, 60)})
+                detractor, passive = rng.uniform(5, 20), rng.uniform(10, 30)
+                rows2.append({'Tahun': year, 'Event': event, 'Unit': unit, 'Detractor': detractor,
+                              'Passive': passive, 'Promoter': 100 - detractor - passive,
+                              'NPS': 100 - 2 * detractor - passive})
+    return {'Sheet1': pd.DataFrame(rows1), 'Sheet2': pd.DataFrame(rows2)}
+
+def write_xlsx(path, sheets):
+    # openpyxl write-only mode streams rows instead of building the whole
+    # workbook in memory, which matters at a million rows per sheet.
+    from openpyxl import Workbook
+    workbook = Workbook(write_only=True)
+    for name, df in sheets.items():
+        if len(df) > XLSX_MAX_ROWS:
+            raise SystemExit(f"{name}: {len(df)} rows do not fit in one xlsx sheet; use --format parquet")
+        sheet = workbook.create_sheet(name)
+        sheet.append(list(df.columns))
+        values = df.astype(object).where(df.notna(), None)
+        for row in values.itertuples(index=False, name=None):
+            sheet.append(row)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    workbook.save(path)
+
+def write_parquet(path, sheets):
+    path.mkdir(parents=True, exist_ok=True)
+    for name, df in sheets.items():
+        df.to_parquet(path / f"{name}.parquet")
+
+def write_sheets(root, file_type, sheets, fmt, year=None, event=None):
+    from data_sources import workbook_path
+    if fmt == 'xlsx':
+        write_xlsx(workbook_path(root, file_type, year, event), sheets)
+    else:
+        write_parquet(workbook_path(root, file_type, year, event, suffix=""), sheets)
+
+def measure(fn, reset=None, repeat=3):
+    if reset is not None:
+        reset()
+    start = time.perf_counter()
+    fn()
+    cold = time.perf_counter() - start
+
+    warm = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        warm.append(time.perf_counter() - start)
+
+    if reset is not None:
+        reset()
+    tracemalloc.start()
+    fn()
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return {"cold_s": cold, "warm_s": median(warm), "warm_min_s": min(warm), "peak_mb": peak / 1e6}
+
+def start_stub(root):
+    from http.server import ThreadingHTTPServer
+    from gas_stub import make_handler
+    server = ThreadingHTTPServer(("127.0.0.1", 0), make_handler(Path(root)))
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f"http://127.0.0.1:{server.server_port}/exec"
+
+def run_size(utils, st, args, workdir, respondents):
+    import data
+    from data_sources import GasSource, LocalSource
+    from disk_cache import CACHE_DIR, cache_key
+
+    rng = np.random.default_rng(args.seed)
+    root = workdir / f"n{respondents}"
+    start = time.perf_counter()
+    frames = synthetic_workbook(rng, respondents, utils.UNITS)
+    write_sheets(root, "data", frames, args.format, YEAR, EVENT)
+    write_sheets(root, "archive", synthetic_archive(rng, args.periods, utils.EVENTS, utils.UNITS), args.format)
+    generate_s = time.perf_counter() - start
+    del frames
+
+    server = None
+    if args.http:
+        server, url = start_stub(root)
+        data.data_source = GasSource(url)
+    else:
+        data.data_source = LocalSource(root)
+
+    def clear_memory():
+        st.cache_data.clear()
+        st.cache_resource.clear()
+
+    def clear_all():
+        clear_memory()
+        shutil.rmtree(CACHE_DIR, ignore_errors=True)
+
+    def rewind(payload):
+        if hasattr(payload, "file"):
+            payload.file.seek(0)
+        return payload
+
+    key = cache_key("data", YEAR, EVENT)
+    payload = utils.fetch_from_gas("data", year=YEAR, event=EVENT)
+    frames = utils.load_workbook(YEAR, EVENT)
+    df = frames['Dufan']
+    by_slice = {(int(YEAR), EVENT, unit): frame for unit, frame in frames.items()}
+    df1, df2 = utils.load_archive()
+    index1, index2 = utils.load_archive_index()
+    window1 = utils.select_data(df1, YEAR, EVENT, 'Dufan', index=index1)
+    window2 = utils.select_data(df2, YEAR, EVENT, 'Dufan', index=index2)
+
+    stages = {
+        "fetch": (lambda: utils.fetch_from_gas("data", year=YEAR, event=EVENT), None),
+        "parse": (lambda: utils.parse_workbook(key, rewind(payload), prepare=utils.prepare_respondents), clear_all),
+        "load_data": (lambda: utils.load_data(YEAR, EVENT, 'Dufan'), clear_all),
+        "load_data_from_disk": (lambda: utils.load_data(YEAR, EVENT, 'Dufan'), clear_memory),
+        "calculate_scores": (lambda: [utils.calculate_scores(frame) for frame in frames.values()], None),
+        "build_score_cube": (lambda: utils.build_score_cube(by_slice), None),
+        "load_scores": (lambda: utils.load_scores(YEAR, EVENT, 'Dufan'), clear_memory),
+        "distributions": (lambda: utils.distributions(df), None),
+        "altair_barh_percent": (lambda: [utils.altair_barh_percent(df, column).to_dict()
+                                         for column in utils.DEMOGRAPHIC_COLUMNS], None),
+        "comment_index": (lambda: utils.search_comments(utils.build_comment_index(df), "antri"), None),
+        "sync_archive": (lambda: utils.sync_archive(force=True), clear_all),
+        "select_data": (lambda: utils.select_data(df1, YEAR, EVENT, 'Dufan'), None),
+        "select_data_indexed": (lambda: utils.select_data(df1, YEAR, EVENT, 'Dufan', index=index1), None),
+        "trend_chart": (lambda: utils.trend_chart(window1, 'Dufan').to_dict(), None),
+        "nps_distribution_chart": (lambda: utils.nps_distribution_chart(window2, 'Dufan').to_dict(), None),
+    }
+    results = []
+    for stage, (fn, reset) in stages.items():
+        if args.stages and stage not in args.stages:
+            continue
+        result = {"respondents": respondents, "stage": stage, **measure(fn, reset, args.repeat)}
+        results.append(result)
+        print(f"{respondents:>9} {stage:<24} cold {result['cold_s']:8.4f}s  warm {result['warm_s']:8.4f}s"
+              f"  peak {result['peak_mb']:8.1f} MB", flush=True)
+
+    if server is not None:
+        server.shutdown()
+    shutil.rmtree(root, ignore_errors=True)
+    return {"respondents": respondents, "generate_s": generate_s,
+            "payload_bytes": payload.size, "archive_rows": len(df1)}, results
+
+def git_revision():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=ROOT, capture_output=True,
+                              text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+def compare(results, baseline_path):
+    baseline = {(r["respondents"], r["stage"]): r for r in json.loads(Path(baseline_path).read_text())["results"]}
+    print(f"\n{'respondents':>11} {'stage':<24} {'cold':>8} {'warm':>8} {'peak':>8}   (current / baseline)")
+    for r in results:
+        old = baseline.get((r["respondents"], r["stage"]))
+        if old is None:
+            continue
+        ratios = [r[m] / old[m] if old[m] else float("nan") for m in ("cold_s", "warm_s", "peak_mb")]
+        print(f"{r['respondents']:>11} {r['stage']:<24} " + " ".join(f"{x:7.2f}x" for x in ratios))
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the dashboard data pipeline on synthetic workbooks.")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10000, 100000],
+                        help="respondents per workbook, split across the six units")
+    parser.add_argument("--periods", type=int, default=20, help="years of history in the synthetic archive")
+    parser.add_argument("--format", choices=["xlsx", "parquet"], default="xlsx",
+                        help="xlsx tops out at ~6.3M respondents; parquet generates much faster")
+    parser.add_argument("--http", action="store_true", help="serve the workbooks through gas_stub.py")
+    parser.add_argument("--repeat", type=int, default=3, help="warm runs per stage")
+    parser.add_argument("--stages", nargs="+", help="only run these stages")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--workdir", help="where workbooks and the disk cache go (default: a temp dir)")
+    parser.add_argument("--output", default="bench_results.json")
+    parser.add_argument("--compare", help="earlier --output file to print ratios against")
+    args = parser.parse_args()
+    if args.http and args.format != "xlsx":
+        parser.error("--http serves xlsx workbooks only")
+
+    workdir = Path(args.workdir or tempfile.mkdtemp(prefix="dashboard-bench-"))
+    # Both are read at import time, so they have to be set before utils loads.
+    os.environ["DASHBOARD_CACHE_DIR"] = str(workdir / "cache")
+    os.environ["DASHBOARD_SOURCE"] = str(workdir)
+    import streamlit as st
+    import streamlit.logger
+    # Bare mode (no `streamlit run`) warns on every cached call. Reading an
+    # option first makes Streamlit parse its config, which resets the level.
+    st.get_option("logger.level")
+    streamlit.logger.set_log_level("error")
+    import utils
+
+    runs, results = [], []
+    for respondents in args.sizes:
+        run, stage_results = run_size(utils, st, args, workdir, respondents)
+        runs.append(run)
+        results.extend(stage_results)
+    if not args.workdir:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    report = {
+        "meta": {
+            "timestamp": datetime.datetime.now(datetime.timezone.utc).isoformat(),
+            "revision": git_revision(),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "pandas": pd.__version__,
+            "numpy": np.__version__,
+            "format": args.format,
+            "http": args.http,
+            "periods": args.periods,
+            "repeat": args.repeat,
+            "max_rss_mb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024,
+        },
+        "runs": runs,
+        "results": results,
+    }
+    Path(args.output).write_text(json.dumps(report, indent=2))
+    print(f"Wrote {args.output}")
+    if args.compare:
+        compare(results, args.compare)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,89 @@
+from pathlib import Path
+from statistics import median
+import argparse
+import ast
+import json
+import subprocess
+import sys
+import tempfile
+
+# Cold-start cost of the dashboard: runs the module-level imports of
+# dashboard.py (what every new server process pays before the first page)
+# in fresh interpreters and reports wall time, peak RSS and which heavy
+# libraries got loaded.
+#   python benchmarks/bench_startup.py
+#   python benchmarks/bench_startup.py --revision HEAD~1   # same, for an older tree
+# The "selection" scenario adds the imports that happen once a year, event
+# and unit are picked.
+ROOT = Path(__file__).resolve().parent.parent
+HEAVY_MODULES = ["pandas", "numpy", "pyarrow", "altair", "openpyxl", "requests", "plotly", "matplotlib", "IPython"]
+SELECTION_IMPORTS = "import utils, altair\nutils.load_data, utils.altair_barh_percent, utils.trend_chart_spec\n"
+
+PROBE = """
+import resource, sys, time
+start = time.perf_counter()
+exec(compile({code!r}, "<startup>", "exec"))
+elapsed = time.perf_counter() - start
+heavy = [name for name in {heavy!r} if name in sys.modules]
+print({{"seconds": elapsed, "max_rss_mb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024,
+       "modules": len(sys.modules), "heavy": heavy}})
+"""
+
+def top_level_imports(source):
+    # Only the imports at module level: the ones every process runs.
+    tree = ast.parse(source)
+    return "\n".join(ast.unparse(node) for node in tree.body if isinstance(node, (ast.Import, ast.ImportFrom))) + "\n"
+
+def probe(tree, code, runs):
+    samples = []
+    for _ in range(runs):
+        out = subprocess.run([sys.executable, "-c", PROBE.format(code=code, heavy=HEAVY_MODULES)],
+                             cwd=tree, capture_output=True, text=True)
+        if out.returncode != 0:
+            return {"error": out.stderr.strip().splitlines()[-1]}
+        samples.append(ast.literal_eval(out.stdout.strip().splitlines()[-1]))
+    return {
+        "seconds": median(s["seconds"] for s in samples),
+        "seconds_min": min(s["seconds"] for s in samples),
+        "max_rss_mb": median(s["max_rss_mb"] for s in samples),
+        "modules": samples[-1]["modules"],
+        "heavy": samples[-1]["heavy"],
+    }
+
+def bench(tree, runs):
+    landing = top_level_imports((Path(tree) / "dashboard.py").read_text())
+    return {
+        "landing": probe(tree, landing, runs),
+        "selection": probe(tree, landing + SELECTION_IMPORTS, runs),
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description="Measure dashboard start-up import cost.")
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--revision", help="also measure this git revision (checked out in a temporary worktree)")
+    parser.add_argument("--output", help="write the results as JSON")
+    args = parser.parse_args()
+
+    results = {"working tree": bench(ROOT, args.runs)}
+    if args.revision:
+        with tempfile.TemporaryDirectory(prefix="dashboard-startup-") as tmp:
+            worktree = Path(tmp) / "tree"
+            subprocess.run(["git", "worktree", "add", "--detach", str(worktree), args.revision],
+                           cwd=ROOT, check=True, capture_output=True)
+            try:
+                results[args.revision] = bench(worktree, args.runs)
+            finally:
+                subprocess.run(["git", "worktree", "remove", "--force", str(worktree)], cwd=ROOT, capture_output=True)
+
+    for tree, scenarios in results.items():
+        for scenario, r in scenarios.items():
+            if "error" in r:
+                print(f"{tree:<14} {scenario:<10} failed: {r['error']}")
+                continue
+            print(f"{tree:<14} {scenario:<10} {r['seconds']:6.3f}s  rss {r['max_rss_mb']:6.1f} MB"
+                  f"  {r['modules']:5d} modules  heavy: {', '.join(r['heavy']) or '-'}")
+    if args.output:
+        Path(args.output).write_text(json.dumps(results, indent=2))
+
+if __name__ == "__main__":
+    main()
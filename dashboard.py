@@ -1,17 +1,15 @@
 import streamlit as st
-import plotly.express as px
-import matplotlib.pyplot as plt
-from IPython.display import display
-import altair as alt
-import pandas as pd
-from pathlib import Path
-import base64
-from utils import calculate_scores, get_value_counts_percentage, select_data, make_metric_card, altair_barh_percent, sentiment_card, load_archive, load_data, img_to_base64
+import math
+from utils import YEARS, EVENTS, UNITS
+from assets import asset_src, preload_assets
+from warmup import WARMUP_ENABLED, start_background_warm_up
+import instrument
 import warnings
 warnings.filterwarnings('ignore')
 
 #header
 st.set_page_config(page_title="CSI CLI NPS", page_icon=":bar_chart:", layout="wide")
+run = instrument.start_run()
 
 st.markdown(
     """
@@ -29,9 +27,12 @@ st.markdown(
 )
 
 #dropdown
-years = ['Please select here', '2023', '2024', '2025']
-events = ['Please select here', 'Lebaran', 'Libur Sekolah', "Low Season", 'Nataru']
-units = ['Please select here', 'Ancol', 'Dufan', 'Atlantis', 'Sea World', 'Samudra', 'Jakarta Bird Land']
+years = ['Please select here'] + YEARS
+events = ['Please select here'] + EVENTS
+units = ['Please select here'] + UNITS
+
+if WARMUP_ENABLED:
+    start_background_warm_up()
 
 for key, default in [("selected_unit", "Please select here"),
                      ("selected_year", "Please select here"),
@@ -48,18 +49,17 @@ unit_logo_map = {
     "Samudra": "samudra.png",
     "Jakarta Bird Land": "jbl.png"
 }
+preload_assets({**{name: 250 for name in unit_logo_map.values()}, "combo.png": 200, "nps.png": 200})
 
 logo_filename = unit_logo_map.get(st.session_state.selected_unit, "ancol.png")
 title_suffix = f" {st.session_state.selected_unit}" if st.session_state.selected_unit != "Please select here" else ""
 
-img_path = Path(__file__).parent / "img" / logo_filename
-with open(img_path, "rb") as f:
-    img_base64 = base64.b64encode(f.read()).decode()
+logo_src = asset_src(logo_filename, width=250)
 
 st.markdown(
     f"""
     <div style="text-align: center;">
-        <img src="data:image/png;base64,{img_base64}" width="250"/>
+        <img src="{logo_src}" width="250"/>
         <h1 style="margin-top: 10px;">Dashboard CSI, CLI, & NPS{title_suffix}</h1>
     </div>
     """,
@@ -74,259 +74,214 @@ with col2:
 with col3:
     st.selectbox('Choose Unit', units, index=units.index(st.session_state.selected_unit), key="selected_unit")
 
+def safe_delta(current, previous):
+    return current - previous if current is not None and previous is not None else None
+
+def format_score(val):
+    return f"{val:.2f}" if val is not None else "-"
+
+#sections
+# Each section is a fragment fed only (year, event, unit) and reading what it
+# needs through the cached loaders, so interacting with a widget inside one
+# (e.g. the comment search) reruns and resends just that section. Changing the
+# year, event or unit above still reruns the whole page. The utils imports sit
+# in the sections so the landing page never loads the data layer.
+@st.fragment
+@instrument.section("metrics")
+def metrics_section(year, event, unit):
+    from utils import load_scores, sync_archive, previous_period, make_metric_card
+    result = load_scores(year, event, unit)
+    archive = sync_archive()
+    df1, index1 = archive["sheets"]["Sheet1"], archive["indexes"]["Sheet1"]
+    previous_row = previous_period(df1, int(year), event, unit, index=index1)
+
+    if previous_row is not None:
+        delta_csi = safe_delta(result.get("CSI Score (%)"), previous_row.get("CSI"))
+        delta_cli = safe_delta(result.get("CLI Score (%)"), previous_row.get("CLI"))
+        delta_nps = safe_delta(result.get("NPS Score (%)"), previous_row.get("NPS"))
+    else:
+        delta_csi = delta_cli = delta_nps = None
+
+    csi_display = format_score(result.get("CSI Score (%)"))
+    cli_display = format_score(result.get("CLI Score (%)"))
+    nps_display = format_score(result.get("NPS Score (%)"))
+
+    col4, col5, col6, col7 = st.columns((1, 1, 1, 1))
+    with col4:
+        total_resp = result["Respondents"]
+        st.markdown(make_metric_card("Total Respondent", total_resp, icon="👥", color="#4e5b6e", big=True), unsafe_allow_html=True)
+
+    with col5:
+        st.markdown(make_metric_card("CSI Score", csi_display, delta=delta_csi, icon="🤩", color="#4e5b6e"), unsafe_allow_html=True)
+
+    with col6:
+        st.markdown(make_metric_card("CLI Score", cli_display, delta=delta_cli, icon="⭐️", color="#4e5b6e"), unsafe_allow_html=True)
+
+    with col7:
+        st.markdown(make_metric_card("NPS Score", nps_display, delta=delta_nps, icon="🗣️", color="#4e5b6e"), unsafe_allow_html=True)
+
+@st.fragment
+@instrument.section("demographics")
+def demographics_section(year, event, unit):
+    from utils import load_data, load_distributions, altair_barh_percent
+    target_columns = {
+        'Domisili': "📍 Domisili",
+        'Usia': "👤 Usia",
+        'Companions': "🧑‍🧑‍🧒 Companions"
+    }
+
+    dists = load_distributions(year, event, unit)
+    available_columns = [(col, label) for col, label in target_columns.items() if col in dists]
+    if available_columns:
+        df = load_data(year, event, unit)
+        cols = st.columns(len(available_columns), gap="medium")
+
+        for i, (col_name, label) in enumerate(available_columns):
+            with cols[i]:
+                st.markdown(f"<h3 style='text-align: center;'>{label}</h3>", unsafe_allow_html=True)
+                chart = altair_barh_percent(df, col_name, distribution=dists[col_name])
+                with instrument.span("st.altair_chart"):
+                    st.altair_chart(chart, use_container_width=True)
+
+@st.fragment
+@instrument.section("trend")
+def trend_section(year, event, unit):
+    from utils import sync_archive, trend_chart_spec
+    trend_spec = trend_chart_spec(int(year), event, unit, sync_archive()["generation"])
+    if trend_spec is not None:
+        st.vega_lite_chart(trend_spec, use_container_width=True)
+    combo_src = asset_src("combo.png", width=200)
+    st.markdown(
+        f"<div style='text-align:center;'><img src='{combo_src}' width='200'></div>",
+        unsafe_allow_html=True
+    )
+
+@st.fragment
+@instrument.section("nps")
+def nps_section(year, event, unit):
+    from utils import sync_archive, nps_chart_spec
+    nps_spec = nps_chart_spec(int(year), event, unit, sync_archive()["generation"])
+    if nps_spec is not None:
+        st.vega_lite_chart(nps_spec, use_container_width=True)
+    nps_src = asset_src("nps.png", width=200)
+    st.markdown(
+        f"<div style='text-align:center;'><img src='{nps_src}' width='200'></div>",
+        unsafe_allow_html=True
+    )
+
+@st.fragment
+@instrument.section("sentiment")
+def sentiment_section(year, event, unit):
+    from utils import load_data, sentiment_card
+    df = load_data(year, event, unit)
+    st.markdown("<h3 style='text-align: center; margin-bottom: 30px;'>📊 Sentimen</h3>", unsafe_allow_html=True)
+    col8, col9, col10 = st.columns(3, gap="large")
+    sentiment_counts = df['Sentiment'].value_counts()
+    total = len(df['Sentiment'].dropna())
+    pos = sentiment_counts.get('Positive', 0)
+    neu = sentiment_counts.get('Neutral', 0)
+    neg = sentiment_counts.get('Negative', 0)
+
+    with col8:
+        st.markdown(sentiment_card("#00B894", "Positive", pos, pos/total), unsafe_allow_html=True)
+    with col9:
+        st.markdown(sentiment_card("#0984E3", "Neutral", neu, neu/total), unsafe_allow_html=True)
+    with col10:
+        st.markdown(sentiment_card("#D63031", "Negative", neg, neg/total), unsafe_allow_html=True)
+
+@st.fragment
+@instrument.section("comments")
+def comments_section(year, event, unit):
+    from utils import load_data, load_comment_index, search_comments, comment_page, COMMENT_PAGE_SIZE
+    st.markdown("<h4 style='margin-top: 20px;'>📝 Detail Alasan</h4>", unsafe_allow_html=True)
+    comment_index = load_comment_index(year, event, unit)
+    if comment_index is not None:
+        col11, col12, col13 = st.columns((3, 1, 1))
+        with col11:
+            query = st.text_input('Search keywords', key="alasan_query")
+        with col12:
+            sentiment = st.selectbox('Sentiment', ['All', 'Positive', 'Neutral', 'Negative'], key="alasan_sentiment")
+        matches = search_comments(comment_index, query, None if sentiment == 'All' else sentiment)
+        n_pages = max(1, math.ceil(len(matches) / COMMENT_PAGE_SIZE))
+        with col13:
+            # No key: a new search (new max) starts again at page 1.
+            page = st.number_input('Page', min_value=1, max_value=n_pages, value=1, step=1)
+        st.caption(f"{len(matches)} comments · page {page} of {n_pages}")
+        st.dataframe(comment_page(load_data(year, event, unit), matches, page), use_container_width=True, hide_index=True)
+    else:
+        st.warning("Kolom 'Alasan' tidak ditemukan dalam data.")
+
+@st.fragment
+@instrument.section("comparison")
+def comparison_section():
+    st.markdown("<h3 style='text-align: center; margin-top: 30px;'>🔎 Comparison</h3>", unsafe_allow_html=True)
+    if not st.toggle('Compare years, events and units', key="compare_mode"):
+        return
+    col14, col15, col16 = st.columns(3)
+    with col14:
+        compare_years = st.multiselect('Years', YEARS, default=YEARS[-2:], key="compare_years")
+    with col15:
+        compare_events = st.multiselect('Events', EVENTS, default=EVENTS, key="compare_events")
+    with col16:
+        compare_units = st.multiselect('Units', UNITS, default=UNITS, key="compare_units")
+    if not (compare_years and compare_events and compare_units):
+        st.info('Pick at least one year, event and unit to compare.')
+        return
+
+    from utils import load_comparison, comparison_heatmap
+    from gas_client import GasError
+    with st.spinner('Scoring selection...'):
+        try:
+            table = load_comparison(compare_years, compare_events, compare_units)
+        except GasError:
+            st.error('The data server is not responding right now. Please try again in a moment.')
+            return
+    if table.empty:
+        st.warning('No survey data for this selection.')
+        return
+    st.caption("Scores per unit and period; the second line is the change from the same event a year earlier.")
+    with instrument.span("st.altair_chart"):
+        st.altair_chart(comparison_heatmap(table))
+
 if (
     st.session_state.selected_year != 'Please select here' and
     st.session_state.selected_event != 'Please select here' and
     st.session_state.selected_unit != 'Please select here'
 ):
+    from utils import load_data, sync_archive
+    from gas_client import GasError
+
+    selected_year = st.session_state.selected_year
+    selected_event = st.session_state.selected_event
+    selected_unit = st.session_state.selected_unit
+
     with st.spinner('Updating Report...'):
-        df = load_data(
-        st.session_state.selected_year,
-        st.session_state.selected_event,
-        st.session_state.selected_unit
-    )
+        try:
+            df = load_data(selected_year, selected_event, selected_unit)
+            # The first archive fetch, too, so a cold start that cannot reach
+            # the server does not fail inside the sections below.
+            sync_archive()
+        except GasError:
+            st.error('The data server is not responding right now. Please try again in a moment.')
+            instrument.finish_run(run)
+            st.stop()
         if df is not None:
-            result = calculate_scores(df)
-            selected_year = int(st.session_state.selected_year)
-            previous_year = selected_year - 1
-            selected_event = st.session_state.selected_event
-            selected_unit = st.session_state.selected_unit
-
-            df1, df2 = load_archive()
-            previous_row = df1[
-                (df1['Tahun'] == previous_year) &
-                (df1['Event'] == selected_event) &
-                (df1['Unit'] == selected_unit)
-            ]
-
-            def safe_delta(current, previous):
-                return current - previous if current is not None and previous is not None else None
-
-            if not previous_row.empty:
-                delta_csi = safe_delta(result.get("CSI Score (%)"), previous_row.iloc[0].get("CSI"))
-                delta_cli = safe_delta(result.get("CLI Score (%)"), previous_row.iloc[0].get("CLI"))
-                delta_nps = safe_delta(result.get("NPS Score (%)"), previous_row.iloc[0].get("NPS"))
-            else:
-                delta_csi = delta_cli = delta_nps = None
-
-            def format_score(val):
-                return f"{val:.2f}" if val is not None else "-"
-
-            csi_display = format_score(result.get("CSI Score (%)"))
-            cli_display = format_score(result.get("CLI Score (%)"))
-            nps_display = format_score(result.get("NPS Score (%)"))
-
-            col4, col5, col6, col7 = st.columns((1, 1, 1, 1))
-            with col4:
-                total_resp = int(df["CSI"].count())
-                st.markdown(make_metric_card("Total Respondent", total_resp, icon="👥", color="#4e5b6e", big=True), unsafe_allow_html=True)
-
-            with col5:
-                st.markdown(make_metric_card("CSI Score", csi_display, delta=delta_csi, icon="🤩", color="#4e5b6e"), unsafe_allow_html=True)
-
-            with col6:
-                st.markdown(make_metric_card("CLI Score", cli_display, delta=delta_cli, icon="⭐️", color="#4e5b6e"), unsafe_allow_html=True)
-
-            with col7:
-                st.markdown(make_metric_card("NPS Score", nps_display, delta=delta_nps, icon="🗣️", color="#4e5b6e"), unsafe_allow_html=True)
+            metrics_section(selected_year, selected_event, selected_unit)
 
             st.write("")
-            target_columns = {
-                'Domisili': "📍 Domisili",
-                'Usia': "👤 Usia",
-                'Companions': "🧑‍🧑‍🧒 Companions"
-            }
-
-            available_columns = [(col, label) for col, label in target_columns.items() if col in df.columns]
-            if available_columns:
-                cols = st.columns(len(available_columns), gap="medium")
-
-                for i, (col_name, label) in enumerate(available_columns):
-                    with cols[i]:
-                        st.markdown(f"<h3 style='text-align: center;'>{label}</h3>", unsafe_allow_html=True)
-                        chart = altair_barh_percent(df, col_name)
-                        st.altair_chart(chart, use_container_width=True)
+            demographics_section(selected_year, selected_event, selected_unit)
 
             g4, g5 = st.columns((1,1), gap="medium")
             with g4:
-                df2_filtered = select_data(df1, selected_year, selected_event, selected_unit)
-
-                for col in ["CSI", "CLI", "NPS"]:
-                    df2_filtered[col] = pd.to_numeric(df2_filtered[col], errors='coerce')
-
-                df2_filtered["Event_Year"] = df2_filtered["Event"].astype(str) + " " + df2_filtered["Tahun"].astype(str)
-
-                df_long = pd.melt(df2_filtered,
-                                id_vars=["Event_Year", "Tahun", "Event"],
-                                value_vars=["CSI", "CLI", "NPS"],
-                                var_name="Metric",
-                                value_name="Score")
-
-                color_scale = alt.Scale(
-                    domain=["CSI", "CLI", "NPS"],
-                    range=["#1f77b4", "#ff7f0e", "#98c379"]
-                )
-
-                # base chart
-                base = alt.Chart(df_long).encode(
-                    x=alt.X("Event_Year:N", title="", sort=df2_filtered["Event_Year"].tolist(),
-                            axis=alt.Axis(labelAngle=0))
-                )
-
-                # line CSI & CLI
-                line = base.transform_filter(
-                    alt.FieldOneOfPredicate(field="Metric", oneOf=["CSI", "CLI"])
-                ).mark_line(point=True).encode(
-                    y=alt.Y("Score:Q", title="Score (%)"),
-                    color=alt.Color("Metric:N", scale=color_scale, legend=alt.Legend(title="Metric", orient="bottom")),
-                    tooltip=["Tahun", "Event", "Metric", "Score"]
-                )
-
-                # bar NPS
-                bar = base.transform_filter(
-                    alt.datum.Metric == "NPS"
-                ).mark_bar(size=40).encode(
-                    y="Score:Q",
-                    color=alt.Color("Metric:N", scale=color_scale, legend=None),
-                    tooltip=["Tahun", "Event", "Metric", "Score"]
-                )
-
-                # text
-                text_csi = base.transform_filter(
-                    alt.datum.Metric == "CSI"
-                ).mark_text(align='center', dy=-15, color="#1f77b4").encode(
-                    y="Score:Q",
-                    text="Score:Q"
-                )
-
-                text_cli = base.transform_filter(
-                    alt.datum.Metric == "CLI"
-                ).mark_text(align='center', dy=15, color="#ff7f0e").encode(
-                    y="Score:Q",
-                    text="Score:Q"
-                )
-
-                text_nps = base.transform_filter(
-                    alt.datum.Metric == "NPS"
-                ).mark_text(align='center', dy=-5, color="black").encode(
-                    y="Score:Q",
-                    text="Score:Q"
-                )
-
-                # combine
-                chart = alt.layer(bar, line, text_csi, text_cli, text_nps).properties(
-                    title=alt.TitleParams(
-                        text=f"CSI/CLI/NPS - {selected_unit}",
-                        fontSize=20,         
-                        anchor='middle'      
-                    ),
-                    width=550,
-                    height=350
-                )
-
-                st.altair_chart(chart, use_container_width=True)
-                img_base64 = img_to_base64(Path(__file__).parent / "img" / "combo.png")
-                st.markdown(
-                    f"<div style='text-align:center;'><img src='{img_base64}' width='200'></div>",
-                    unsafe_allow_html=True
-                )
-
+                trend_section(selected_year, selected_event, selected_unit)
             with g5:
-                df_filtered = select_data(df2, selected_year, selected_event, selected_unit)
-                
-                for col in ["Detractor", "Passive", "Promoter", "NPS"]:
-                    df_filtered[col] = pd.to_numeric(df_filtered[col], errors='coerce')
-
-                df_filtered["Event_Year"] = df_filtered["Event"].astype(str) + " " + df_filtered["Tahun"].astype(str)
-                df_filtered = df_filtered.sort_values(by=["Tahun", "Event"], ascending=[False, False]).reset_index(drop=True)
-                df_filtered["Index"] = df_filtered.index
-
-                nps_long = df_filtered.melt(
-                    id_vars=["Event_Year", "Index"],
-                    value_vars=["Detractor", "Passive", "Promoter"],
-                    var_name="Kategori",
-                    value_name="Persentase"
-                )
-
-                color_scale = alt.Scale(
-                    domain=["Detractor", "Passive", "Promoter"],
-                    range=["#EA4335", "#FFD966", "#73B855"]
-                )
-
-                bar = alt.Chart(nps_long).mark_bar().encode(
-                    y=alt.Y("Event_Year:N", title="", axis=alt.Axis(labelAngle=0, grid=False),
-                            sort=alt.EncodingSortField(field="Index", order="descending")),
-                    x=alt.X("Persentase:Q", stack="zero", title=None, scale=alt.Scale(domain=[0, 100])),
-                    color=alt.Color("Kategori:N", scale=color_scale, legend=None),
-                    tooltip=["Event_Year", "Kategori", "Persentase"]
-                )
-
-                # Label dalam bar (< 5)
-                bar_text_outside = alt.Chart(nps_long[nps_long["Persentase"] < 5]).mark_text(
-                    align='center',
-                    baseline='middle',
-                    color='#393737',
-                    fontSize=11
-                ).encode(
-                    y=alt.Y("Event_Year:N", sort=alt.EncodingSortField(field="Index", order="descending")),
-                    x=alt.X("Persentase:Q", stack="center"),
-                    text=alt.Text("Persentase:Q", format=".1f")
-                )
-
-                # Label di luar bar (>= 5)
-                bar_text_inside = alt.Chart(nps_long[nps_long["Persentase"] >= 5]).mark_text(
-                    align='right',
-                    baseline='middle',
-                    dx=-5,
-                    color='#393737',
-                    fontSize=11
-                ).encode(
-                    y=alt.Y("Event_Year:N", sort=alt.EncodingSortField(field="Index", order="descending")),
-                    x=alt.X("Persentase:Q", stack="zero"),
-                    text=alt.Text("Persentase:Q", format=".1f")
-                )
-
-                final_chart = (bar + bar_text_inside + bar_text_outside).properties(
-                    width=550,
-                    height=350,
-                    title=alt.TitleParams(
-                        text=f"Distribusi NPS - {selected_unit}",
-                        fontSize=20,
-                        anchor='middle'
-                    )
-                ).configure_axis(
-                    labelFontSize=12,
-                    titleFontSize=14,
-                    grid=False
-                )
-
-                st.altair_chart(final_chart, use_container_width=True)
-                img_base64 = img_to_base64(Path(__file__).parent / "img" / "nps.png")
-                st.markdown(
-                    f"<div style='text-align:center;'><img src='{img_base64}' width='200'></div>",
-                    unsafe_allow_html=True
-                )
-
-            st.markdown("<h3 style='text-align: center; margin-bottom: 30px;'>📊 Sentimen</h3>", unsafe_allow_html=True)
-            col8, col9, col10 = st.columns(3, gap="large")
-            sentiment_counts = df['Sentiment'].value_counts()
-            total = len(df['Sentiment'].dropna())
-            pos = sentiment_counts.get('Positive', 0)
-            neu = sentiment_counts.get('Neutral', 0)
-            neg = sentiment_counts.get('Negative', 0)
-
-            with col8:
-                st.markdown(sentiment_card("#00B894", "Positive", pos, pos/total), unsafe_allow_html=True)
-            with col9:
-                st.markdown(sentiment_card("#0984E3", "Neutral", neu, neu/total), unsafe_allow_html=True)
-            with col10:
-                st.markdown(sentiment_card("#D63031", "Negative", neg, neg/total), unsafe_allow_html=True)
-
-            st.markdown("<h4 style='margin-top: 20px;'>📝 Detail Alasan</h4>", unsafe_allow_html=True)
-            if 'Alasan' in df.columns:
-                df['Alasan'] = df['Alasan'].astype(str) 
-                st.dataframe(df[['Alasan']], use_container_width=True)
-            else:
-                st.warning("Kolom 'Alasan' tidak ditemukan dalam data.")
+                nps_section(selected_year, selected_event, selected_unit)
+
+            sentiment_section(selected_year, selected_event, selected_unit)
+            comments_section(selected_year, selected_event, selected_unit)
         else:
             st.error('Please select valid options for Year, Event, and Unit.')
+
+comparison_section()
+
+instrument.render_panel(instrument.finish_run(run))
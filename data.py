@@ -0,0 +1,542 @@
+from concurrent.futures import ThreadPoolExecutor
+import bisect
+import logging
+import os
+import pickle
+import re
+import threading
+import time
+import numpy as np
+import pandas as pd
+import streamlit as st
+from streamlit.runtime.scriptrunner import add_script_run_ctx, get_script_run_ctx
+import instrument
+from gas_client import NOT_MODIFIED, GasError
+from data_sources import make_source, read_sheets
+from disk_cache import CACHE_TTL, cache_key, current_generation, is_fresh, read_meta, read_frames, refresh, refresh_lock, write_frames
+from scoring import CUBE_COLUMNS, build_score_cube, comparison_table, distributions
+from utils import EVENTS, UNITS, YEARS
+
+# Loading and caching: the data source, workbook parsing and the disk and
+# in-process caches, the archive sync and index, and the cached per-selection
+# loaders built on them.
+
+logger = logging.getLogger(__name__)
+
+# Load-time dtypes of the respondent sheets: Likert scores as nullable int8,
+# low-cardinality text as categoricals, free text as Arrow-backed strings.
+RESPONDENT_SCHEMA = {
+    'CSI': 'score',
+    'CLI': 'score',
+    'NPS': 'score',
+    'Sentiment': 'category',
+    'Domisili': 'category',
+    'Usia': 'category',
+    'Companions': 'category',
+    'Alasan': 'text',
+}
+TEXT_DTYPE = pd.StringDtype('pyarrow')
+
+def _score_dtype(series):
+    values = pd.to_numeric(series, errors='coerce')
+    finite = values.dropna()
+    if ((finite == np.floor(finite)) & (finite.abs() <= 127)).all():
+        return values.astype('Int8')
+    # Half points and the like stay float so averages are unchanged.
+    return values.astype('float64')
+
+def prepare_respondents(df):
+    # Schema-driven dtype coercion; a no-op for frames already prepared.
+    for col, kind in RESPONDENT_SCHEMA.items():
+        if col not in df.columns:
+            continue
+        dtype = df[col].dtype
+        if kind == 'score' and dtype != 'Int8':
+            df[col] = _score_dtype(df[col])
+        elif kind == 'category' and not isinstance(dtype, pd.CategoricalDtype):
+            df[col] = df[col].astype('category')
+        elif kind == 'text' and dtype != TEXT_DTYPE:
+            df[col] = df[col].astype(TEXT_DTYPE)
+    return df
+
+def frames_memory(frames):
+    # Bytes held in memory and bytes st.cache_data pickles per copy.
+    in_memory = sum(int(df.memory_usage(deep=True).sum()) for df in frames.values())
+    pickled = sum(len(pickle.dumps(df, protocol=pickle.HIGHEST_PROTOCOL)) for df in frames.values())
+    return in_memory, pickled
+
+SCRIPT_URL = os.environ.get(
+    "DASHBOARD_GAS_URL",
+    "https://script.google.com/macros/s/AKfycbwnXc7ooKicgCnTHzzU7Xv4AHNr-CUTGWDvhlKqN6suij1tbsyl6brkqT0jILxRJjMyeQ/exec",
+)
+data_source = make_source(gas_url=SCRIPT_URL)
+
+# Not memoized itself: the parsed workbook caches below sit on top of it, and
+# scheduled warm-ups need every call to reach the backend. The source is the
+# Apps Script endpoint unless DASHBOARD_SOURCE points elsewhere.
+def fetch_from_gas(file_type, year=None, event=None, unit=None, **params):
+    with instrument.span(f"fetch {file_type}"):
+        payload = data_source.fetch(file_type, year=year, event=event, unit=unit, **params)
+    if payload is not None and payload is not NOT_MODIFIED:
+        instrument.count("fetch.count")
+        # Bytes over the wire (about 4/3 of the workbook for base64); local
+        # sources have no transfer encoding, so there it is the file size.
+        instrument.count("fetch.bytes", getattr(payload, "received", None) or payload.size)
+        instrument.count("fetch.decoded_bytes", payload.size)
+    return payload
+
+def parse_workbook(key, payload, sheet_names=None, prepare=None):
+    meta = read_meta(key)
+    if meta is not None and meta["hash"] == payload.digest:
+        frames = read_frames(key, max_age=None)
+        if frames is not None:
+            refresh(key)
+            return frames
+
+    # One openpyxl pass over every requested sheet (all of them when None),
+    # straight from the decoded payload buffer; parquet sources arrive parsed.
+    with instrument.span("parse"):
+        frames = read_sheets(payload, sheet_names)
+    if prepare is not None:
+        # Measuring pickles every frame twice: only when someone looks at it.
+        measure = instrument.ENABLED or logger.isEnabledFor(logging.INFO)
+        before = frames_memory(frames) if measure else None
+        with instrument.span("prepare"):
+            frames = {name: prepare(df) for name, df in frames.items()}
+        if measure:
+            after = frames_memory(frames)
+            instrument.count("parse.bytes_in_memory", after[0])
+            instrument.count("parse.bytes_pickled", after[1])
+            logger.info("Parsed %s: %.1f MB in memory, %.1f MB pickled (%.1f MB / %.1f MB as read)",
+                        key, after[0] / 1e6, after[1] / 1e6, before[0] / 1e6, before[1] / 1e6)
+    write_frames(key, frames, payload.digest)
+    return frames
+
+# After a failed refetch the local copy is served this long before retrying.
+FETCH_RETRY_INTERVAL = int(os.environ.get("DASHBOARD_FETCH_RETRY_INTERVAL", 5 * 60))
+
+def _refresh_workbook(key, year, event, max_age, stale=None):
+    # Under the refresh lock: another process may have just written it.
+    frames = read_frames(key, max_age)
+    if frames is None:
+        try:
+            payload = fetch_from_gas("data", year=year, event=event)
+        except GasError:
+            previous = stale if stale is not None else read_frames(key, max_age=None)
+            if previous is None:
+                raise
+            logger.warning("Refreshing %s failed, serving the local copy", key, exc_info=True)
+            refresh(key, fetched_at=time.time() - CACHE_TTL + FETCH_RETRY_INTERVAL)
+            return previous
+        if payload is None:
+            return None
+        frames = parse_workbook(key, payload, prepare=prepare_respondents)
+    return frames
+
+def read_workbook(year, event, max_age=CACHE_TTL, stale=None):
+    key = cache_key("data", year, event)
+    frames = read_frames(key, max_age)
+    instrument.count("cache.disk.calls")
+    if frames is None:
+        instrument.count("cache.disk.misses")
+        # One process refreshes; the others keep serving the previous
+        # generation meanwhile, or wait for the first one if there is none.
+        has_previous = read_meta(key) is not None
+        with refresh_lock(key, blocking=not has_previous) as refreshing:
+            if refreshing:
+                frames = _refresh_workbook(key, year, event, max_age, stale)
+            elif stale is not None:
+                return stale
+            else:
+                frames = read_frames(key, max_age=None)
+        if frames is None and not refreshing:
+            # The previous generation is unreadable as well: wait for the
+            # refresh in progress instead.
+            with refresh_lock(key):
+                frames = _refresh_workbook(key, year, event, max_age)
+        if frames is None:
+            return None
+    return {unit: prepare_respondents(df) for unit, df in frames.items()}
+
+def build_archive_index(df):
+    # Built once per archive load: (Tahun, Event, Unit) -> row position, each
+    # unit's row positions ordered by Tahun (sheet order within a year, since
+    # event order is not alphabetical), and each position's rank in that list.
+    tahun = pd.to_numeric(df["Tahun"], errors="coerce").to_numpy()
+    keys = {}
+    unit_rows = {}
+    for pos, (t, event, unit) in enumerate(zip(tahun, df["Event"].astype(str), df["Unit"].astype(str))):
+        if np.isnan(t):
+            continue
+        keys.setdefault((int(t), event, unit), pos)
+        unit_rows.setdefault(unit, []).append(pos)
+
+    for unit, rows in unit_rows.items():
+        rows.sort(key=lambda pos: tahun[pos])
+    return {
+        "rows": keys,
+        "units": unit_rows,
+        "rank": {pos: i for rows in unit_rows.values() for i, pos in enumerate(rows)},
+        "tahun": tahun.tolist(),
+    }
+
+def index_append(index, pos, tahun, event, unit):
+    # Registers a row appended at position pos without rebuilding the index.
+    index["tahun"].append(tahun)
+    index["rows"].setdefault((int(tahun), event, unit), pos)
+    rows = index["units"].setdefault(unit, [])
+    at = bisect.bisect_right(rows, tahun, key=lambda p: index["tahun"][p])
+    rows.insert(at, pos)
+    for rank in range(at, len(rows)):
+        index["rank"][rows[rank]] = rank
+
+@instrument.timed()
+def select_data(df, tahun, event, unit, n_sebelumnya=4, index=None):
+    if index is None:
+        index = build_archive_index(df)
+    pos = index["rows"].get((int(tahun), str(event), str(unit)))
+    if pos is None:
+        return pd.DataFrame()
+
+    rank = index["rank"][pos]
+    rows = index["units"][str(unit)][max(0, rank - n_sebelumnya):rank + 1]
+    return df.iloc[rows].copy()
+
+def previous_period(df, tahun, event, unit, index=None):
+    # Same event and unit one year earlier, as a row Series (or None).
+    if index is None:
+        index = build_archive_index(df)
+    pos = index["rows"].get((int(tahun) - 1, str(event), str(unit)))
+    return df.iloc[pos] if pos is not None else None
+
+def archive_watermark(df, index):
+    # "Tahun|Event" of the latest period in the local archive copy.
+    if not index["units"]:
+        return None
+    pos = max((rows[-1] for rows in index["units"].values()), key=lambda p: (index["tahun"][p], p))
+    return f"{int(index['tahun'][pos])}|{df['Event'].iloc[pos]}"
+
+def merge_archive_sheet(df, index, new_rows):
+    # Upserts new_rows by (Tahun, Event, Unit): known periods are overwritten,
+    # new ones appended. Returns the merged frame and an updated copy of the
+    # index; the frame and index passed in are left untouched for readers.
+    index = {
+        "rows": dict(index["rows"]),
+        "units": {unit: list(rows) for unit, rows in index["units"].items()},
+        "rank": dict(index["rank"]),
+        "tahun": list(index["tahun"]),
+    }
+    tahun = pd.to_numeric(new_rows["Tahun"], errors="coerce").to_numpy()
+    updates = {}
+    appended = []
+    for i, (t, event, unit) in enumerate(zip(tahun, new_rows["Event"].astype(str), new_rows["Unit"].astype(str))):
+        if np.isnan(t):
+            continue
+        pos = index["rows"].get((int(t), event, unit))
+        if pos is None:
+            pos = len(df) + len(appended)
+            appended.append(i)
+            index_append(index, pos, t, event, unit)
+        updates[pos] = i
+
+    if not updates:
+        return df, index
+    merged = pd.concat([df, new_rows.iloc[appended]], ignore_index=True)
+    positions = list(updates)
+    sources = list(updates.values())
+    for column in merged.columns.intersection(new_rows.columns):
+        values = new_rows[column].to_numpy()[sources]
+        try:
+            merged.loc[positions, column] = values
+        except (TypeError, ValueError):
+            # e.g. a whole-number column receiving decimals: widen it first.
+            merged[column] = merged[column].astype(object)
+            merged.loc[positions, column] = values
+            merged[column] = merged[column].infer_objects()
+    return merged, index
+
+ARCHIVE_SHEETS = ["Sheet1", "Sheet2"]
+ARCHIVE_SYNC_INTERVAL = int(os.environ.get("DASHBOARD_ARCHIVE_SYNC_INTERVAL", 15 * 60))
+
+@st.cache_resource
+def archive_store():
+    # The archive is small and append-mostly, so it is kept as one shared,
+    # incrementally synced snapshot instead of a st.cache_data entry.
+    # disk_generation: the disk cache generation last loaded, written or seen
+    # by this process; only a different (newer) one is read back.
+    return {"lock": threading.Lock(), "snapshot": None, "digest": None, "synced_at": 0.0, "disk_generation": None}
+
+def _publish_archive(store, sheets, indexes, digest):
+    generation = store["snapshot"]["generation"] + 1 if store["snapshot"] else 1
+    store["snapshot"] = {"sheets": sheets, "indexes": indexes, "generation": generation}
+    store["digest"] = digest
+
+def sync_archive_from_disk(store, key, meta):
+    sheets = read_frames(key, max_age=None)
+    if sheets is not None:
+        indexes = {name: build_archive_index(sheets[name]) for name in ARCHIVE_SHEETS}
+        _publish_archive(store, sheets, indexes, meta["hash"])
+        store["disk_generation"] = meta["generation"]
+        store["synced_at"] = time.time()
+    return store["snapshot"]
+
+def _sync_archive(store, force):
+    now = time.time()
+    if not force and store["snapshot"] is not None and now - store["synced_at"] < ARCHIVE_SYNC_INTERVAL:
+        return store["snapshot"]
+
+    key = cache_key("archive")
+    meta = read_meta(key)
+    if meta is not None and meta["generation"] != store["disk_generation"] and meta["hash"] != store["digest"]:
+        # A newer copy from another process (or a previous run) is on disk.
+        sync_archive_from_disk(store, key, meta)
+    if not force and store["snapshot"] is not None and is_fresh(meta):
+        store["synced_at"] = now
+        return store["snapshot"]
+
+    # Ask only for what changed: a backend that understands these may
+    # answer "Not modified" or send just the rows after the watermark
+    # (echoing it back, see gas_client); anything else is a full workbook.
+    params = {}
+    if store["snapshot"] is not None:
+        sheets, indexes = store["snapshot"]["sheets"], store["snapshot"]["indexes"]
+        params = {"known": store["digest"], "since": archive_watermark(sheets["Sheet1"], indexes["Sheet1"])}
+    with refresh_lock(key, blocking=store["snapshot"] is None) as refreshing:
+        if not refreshing:
+            # Another process is syncing; its result is picked up from
+            # disk on a later call.
+            return store["snapshot"]
+        meta = read_meta(key)
+        if store["snapshot"] is None and is_fresh(meta):
+            # Waited for another process's first fetch.
+            return sync_archive_from_disk(store, key, meta)
+
+        try:
+            payload = fetch_from_gas("archive", **params)
+        except GasError:
+            if store["snapshot"] is None:
+                raise
+            logger.warning("Archive sync failed, serving the local copy", exc_info=True)
+            store["synced_at"] = now
+            return store["snapshot"]
+
+        if payload is NOT_MODIFIED or (payload is not None and payload.digest == store["digest"]):
+            if meta is not None and meta["hash"] == store["digest"]:
+                refresh(key)
+        elif payload is not None:
+            with instrument.span("parse"):
+                new_sheets = read_sheets(payload, ARCHIVE_SHEETS)
+            if payload.since is None or payload.since != params.get("since"):
+                # A full workbook replaces the snapshot, so rows deleted or
+                # re-keyed upstream do not linger.
+                sheets = new_sheets
+                indexes = {name: build_archive_index(sheets[name]) for name in ARCHIVE_SHEETS}
+                digest = payload.digest
+            else:
+                sheets, indexes = {}, {}
+                for name in ARCHIVE_SHEETS:
+                    sheets[name], indexes[name] = merge_archive_sheet(
+                        store["snapshot"]["sheets"][name], store["snapshot"]["indexes"][name], new_sheets[name])
+                # Keep the full workbook's hash, the one &known= is checked
+                # against; without it the next sync fetches the whole thing.
+                digest = payload.full_digest
+            # If the write fails (logged), the older copy left on disk is
+            # remembered as seen, so it is not read back over this one.
+            write_frames(key, sheets, digest)
+            _publish_archive(store, sheets, indexes, digest)
+            meta = read_meta(key)
+            store["disk_generation"] = meta["generation"] if meta is not None else None
+    store["synced_at"] = now
+    return store["snapshot"]
+
+@instrument.timed()
+def sync_archive(force=False):
+    store = archive_store()
+    # Only the very first load waits for the lock; once there is a snapshot, a
+    # session arriving mid-sync keeps reading it instead of stalling behind a
+    # slow fetch (retries, timeouts) for the whole process.
+    if not store["lock"].acquire(blocking=store["snapshot"] is None):
+        return store["snapshot"]
+    try:
+        return _sync_archive(store, force)
+    finally:
+        store["lock"].release()
+
+def load_archive():
+    # Shared frames: callers must copy before modifying (select_data does).
+    snapshot = sync_archive()
+    if snapshot is None:
+        return None, None
+    return snapshot["sheets"]["Sheet1"], snapshot["sheets"]["Sheet2"]
+
+def load_archive_index():
+    snapshot = sync_archive()
+    if snapshot is None:
+        return None, None
+    return snapshot["indexes"]["Sheet1"], snapshot["indexes"]["Sheet2"]
+
+@st.cache_resource
+def workbook_store():
+    # Per-process frames of each workbook's current disk generation, shared
+    # read-only by every session instead of pickled per session.
+    return {}
+
+def workbook_generation(year, event):
+    return current_generation(cache_key("data", year, event))
+
+@instrument.cached("workbook_store")
+def load_workbook(year, event):
+    key = cache_key("data", year, event)
+    store = workbook_store()
+    meta = read_meta(key)
+    cached = store.get(key)
+    if cached is not None:
+        generation, frames = cached
+        if meta is None or (generation == meta["generation"] and is_fresh(meta)):
+            return frames
+        instrument.count("cache.workbook_store.misses")
+        if generation == meta["generation"]:
+            frames = read_workbook(year, event, stale=frames)
+        else:
+            frames = read_workbook(year, event)
+    else:
+        instrument.count("cache.workbook_store.misses")
+        frames = read_workbook(year, event)
+
+    meta = read_meta(key)
+    store[key] = (meta["generation"] if meta is not None else None, frames)
+    return frames
+
+def load_data(year, event, unit):
+    # Shared frame: callers must copy before modifying it.
+    frames = load_workbook(year, event)
+    if frames is None or unit not in frames:
+        return None
+    return frames[unit]
+
+@st.cache_resource(max_entries=64)
+@instrument.miss("score_cube")
+def _score_cube(year, event, generation):
+    frames = load_workbook(year, event)
+    if frames is None:
+        return None
+    return build_score_cube({(int(year), event, unit): df for unit, df in frames.items()})
+
+@instrument.cached("score_cube")
+def load_score_cube(year, event):
+    return _score_cube(year, event, workbook_generation(year, event))
+
+def load_scores(year, event, unit):
+    # calculate_scores-shaped dict for one slice, read from the cube.
+    cube = load_score_cube(year, event)
+    key = (int(year), event, unit)
+    if cube is None or key not in cube.index:
+        return None
+    row = cube.loc[key]
+    result = {name: (None if pd.isna(row[column]) else float(row[column])) for name, column in CUBE_COLUMNS.items()}
+    result["Respondents"] = int(row["Respondents"])
+    return result
+
+COMPARE_WORKERS = int(os.environ.get("DASHBOARD_COMPARE_WORKERS", 6))
+
+def load_workbooks(pairs, workers=COMPARE_WORKERS):
+    # load_workbook for several (year, event) pairs at once, so their fetches
+    # and parses overlap instead of queueing one after another. Workers get
+    # the session's script context, as the calling thread would have.
+    ctx = get_script_run_ctx(suppress_warning=True)
+    with ThreadPoolExecutor(max_workers=workers, initializer=lambda: add_script_run_ctx(threading.current_thread(), ctx)) as pool:
+        return dict(zip(pairs, pool.map(lambda pair: load_workbook(*pair), pairs)))
+
+def comparison_pairs(years, events):
+    # The selected workbooks plus the year before each, for the deltas.
+    wanted = {str(year) for year in years} | {str(int(year) - 1) for year in years}
+    return [(year, event) for year in YEARS if year in wanted for event in EVENTS if event in events]
+
+@st.cache_data(max_entries=32)
+@instrument.miss("comparison")
+def _comparison(years, events, units, generations):
+    pairs = comparison_pairs(years, events)
+    frames_by_slice = {
+        (int(year), event, unit): frames[unit]
+        for (year, event), frames in load_workbooks(pairs).items() if frames is not None
+        for unit in UNITS if unit in units and unit in frames
+    }
+    # One vectorized pass over every slice, previous years included.
+    return comparison_table(build_score_cube(frames_by_slice), years)
+
+@instrument.cached("comparison")
+def load_comparison(years, events, units):
+    # Scores of every selected (year, event, unit) with year-over-year deltas;
+    # within each metric, rows follow YEARS, then EVENTS, then UNITS.
+    generations = tuple(workbook_generation(year, event) for year, event in comparison_pairs(years, events))
+    return _comparison(tuple(sorted(years)), tuple(events), tuple(units), generations)
+
+@st.cache_data(max_entries=256)
+@instrument.miss("distributions")
+def _distributions(year, event, unit, generation):
+    frames = load_workbook(year, event)
+    if frames is None or unit not in frames:
+        return None
+    return distributions(frames[unit])
+
+@instrument.cached("distributions")
+def load_distributions(year, event, unit):
+    return _distributions(year, event, unit, workbook_generation(year, event))
+
+COMMENT_PAGE_SIZE = 50
+TOKEN_PATTERN = r"\w+"
+
+def build_comment_index(df):
+    # Inverted keyword index over Alasan, built once per dataset: sorted
+    # vocabulary, token -> row positions, and Sentiment -> row positions.
+    # Positions, not labels: the frame's index need not be a RangeIndex.
+    text = df['Alasan'].astype(TEXT_DTYPE).reset_index(drop=True)
+    tokens = text.str.lower().str.findall(TOKEN_PATTERN).explode().dropna()
+    rows = np.asarray(tokens.index, dtype=np.int64)
+    postings = {
+        token: np.unique(rows[idx])
+        for token, idx in pd.Series(rows).groupby(tokens.to_numpy()).indices.items()
+    }
+
+    sentiments = {}
+    if 'Sentiment' in df.columns:
+        for label, idx in pd.Series(np.arange(len(df))).groupby(df['Sentiment'].to_numpy()).indices.items():
+            sentiments[label] = idx
+
+    return {
+        "vocabulary": sorted(postings),
+        "postings": postings,
+        "sentiments": sentiments,
+        "rows": np.flatnonzero(text.notna().to_numpy()),
+    }
+
+def search_comments(index, query="", sentiment=None):
+    # Row positions whose Alasan has a word starting with every query term,
+    # optionally restricted to one Sentiment.
+    matches = index["rows"]
+    if sentiment is not None:
+        matches = np.intersect1d(matches, index["sentiments"].get(sentiment, []))
+    for term in re.findall(TOKEN_PATTERN, query.lower()):
+        vocabulary = index["vocabulary"]
+        lo = bisect.bisect_left(vocabulary, term)
+        hi = bisect.bisect_left(vocabulary, term + "\uffff")
+        hits = [index["postings"][token] for token in vocabulary[lo:hi]]
+        matches = np.intersect1d(matches, np.concatenate(hits) if hits else [])
+    return matches
+
+def comment_page(df, matches, page, page_size=COMMENT_PAGE_SIZE):
+    columns = [col for col in ['Sentiment', 'Alasan'] if col in df.columns]
+    start = (page - 1) * page_size
+    return df.iloc[matches[start:start + page_size]][columns]
+
+@st.cache_resource(max_entries=64)
+@instrument.miss("comment_index")
+def _comment_index(year, event, unit, generation):
+    frames = load_workbook(year, event)
+    if frames is None or unit not in frames or 'Alasan' not in frames[unit].columns:
+        return None
+    return build_comment_index(frames[unit])
+
+@instrument.cached("comment_index")
+def load_comment_index(year, event, unit):
+    return _comment_index(year, event, unit, workbook_generation(year, event))
@@ -0,0 +1,107 @@
+from collections import namedtuple
+from pathlib import Path
+import hashlib
+import os
+import shutil
+import pandas as pd
+from gas_client import NOT_MODIFIED, BufferReader, GasClient, GasPayload
+
+# Where workbooks come from. Every source answers fetch() like GasClient does:
+# a payload, NOT_MODIFIED, or None when it has no such workbook.
+#   DASHBOARD_SOURCE unset or "gas"   the Apps Script endpoint (DASHBOARD_GAS_URL)
+#   DASHBOARD_SOURCE=http://...       another endpoint with the same contract,
+#                                     e.g. gas_stub.py replaying a recording
+#   DASHBOARD_SOURCE=/path/to/dir     local xlsx/parquet files, no HTTP at all
+# With DASHBOARD_RECORD_DIR set, every workbook fetched over HTTP is also saved
+# under that directory in the local layout, ready to be replayed.
+#
+# Local layout (the same one gas_stub.py serves):
+#   <root>/archive.xlsx                    or <root>/archive/<sheet>.parquet
+#   <root>/data/<year>/<event>.xlsx        or <root>/data/<year>/<event>/<unit>.parquet
+SOURCE = os.environ.get("DASHBOARD_SOURCE", "gas")
+RECORD_DIR = os.environ.get("DASHBOARD_RECORD_DIR")
+
+# Parquet workbooks arrive already parsed, one frame per sheet.
+FramePayload = namedtuple("FramePayload", ["frames", "digest", "size", "since", "full_digest"], defaults=[None, None])
+
+def workbook_path(root, file_type, year=None, event=None, suffix=".xlsx"):
+    if file_type == "archive":
+        return Path(root) / f"archive{suffix}"
+    return Path(root) / "data" / str(year or "") / f"{event or ''}{suffix}"
+
+def read_sheets(payload, sheet_names=None):
+    # {sheet: DataFrame} for the requested sheets (all of them when None).
+    if isinstance(payload, FramePayload):
+        missing = [name for name in sheet_names or () if name not in payload.frames]
+        if missing:
+            raise ValueError(f"Worksheet named {missing[0]!r} not found")
+        return {name: payload.frames[name] for name in sheet_names or payload.frames}
+    return pd.read_excel(payload.file, sheet_name=sheet_names or None)
+
+class GasSource:
+    def __init__(self, base_url):
+        self.client = GasClient(base_url)
+
+    def fetch(self, file_type, year=None, event=None, unit=None, **params):
+        return self.client.fetch(file_type, year=year, event=event, unit=unit, **params)
+
+class LocalSource:
+    def __init__(self, root):
+        self.root = Path(root)
+
+    def _xlsx(self, path):
+        data = path.read_bytes()
+        return GasPayload(BufferReader(memoryview(data)), hashlib.sha256(data).hexdigest(), len(data))
+
+    def _parquet(self, sheet_dir):
+        files = sorted(sheet_dir.glob("*.parquet"))
+        if not files:
+            return None
+        # Fingerprint from name/size/mtime instead of hashing every byte of
+        # what can be a very large workbook.
+        hasher = hashlib.sha256()
+        for path in files:
+            stat = path.stat()
+            hasher.update(f"{path.name}:{stat.st_size}:{stat.st_mtime_ns};".encode())
+        frames = {path.stem: pd.read_parquet(path) for path in files}
+        return FramePayload(frames, hasher.hexdigest(), sum(path.stat().st_size for path in files))
+
+    def fetch(self, file_type, year=None, event=None, unit=None, known=None, **params):
+        xlsx_path = workbook_path(self.root, file_type, year, event)
+        if xlsx_path.is_file():
+            payload = self._xlsx(xlsx_path)
+        else:
+            payload = self._parquet(workbook_path(self.root, file_type, year, event, suffix=""))
+        if payload is not None and known is not None and payload.digest == known:
+            return NOT_MODIFIED
+        return payload
+
+class RecordingSource:
+    def __init__(self, source, root):
+        self.source = source
+        self.root = Path(root)
+
+    def fetch(self, file_type, year=None, event=None, unit=None, **params):
+        # Always ask for the full workbook so the recording is complete, not
+        # just the rows after an incremental watermark.
+        params.pop("known", None)
+        params.pop("since", None)
+        payload = self.source.fetch(file_type, year=year, event=event, unit=unit, **params)
+        if isinstance(payload, GasPayload):
+            target = workbook_path(self.root, file_type, year, event)
+            target.parent.mkdir(parents=True, exist_ok=True)
+            tmp = target.with_suffix(".tmp")
+            with open(tmp, "wb") as out:
+                shutil.copyfileobj(payload.file, out)
+            tmp.replace(target)
+            payload.file.seek(0)
+        return payload
+
+def make_source(spec=SOURCE, gas_url=None, record_dir=RECORD_DIR):
+    if spec in (None, "", "gas"):
+        source = GasSource(gas_url)
+    elif spec.startswith(("http://", "https://")):
+        source = GasSource(spec)
+    else:
+        return LocalSource(spec)
+    return RecordingSource(source, record_dir) if record_dir else source
@@ -0,0 +1,168 @@
+from contextlib import contextmanager
+from pathlib import Path
+import json
+import logging
+import os
+import shutil
+import time
+import uuid
+import pyarrow as pa
+import pyarrow.feather as feather
+
+try:
+    import fcntl
+except ImportError:  # not POSIX: no cross-process refresh coordination
+    fcntl = None
+
+# Persistent, node-wide cache tier: decoded workbook sheets are stored as
+# uncompressed Arrow IPC files so a restarted process can skip both the Apps
+# Script round-trip and the openpyxl parse, and every Streamlit process
+# pointed at the same DASHBOARD_CACHE_DIR memory-maps the same files.
+#
+# Layout: <key>/CURRENT names the live generation directory <key>/<gen>/
+# (meta.json + one .arrow file per sheet). A refresh writes a new generation
+# and swaps CURRENT atomically; readers pick it up on their next lookup.
+CACHE_DIR = Path(os.environ.get("DASHBOARD_CACHE_DIR", Path(__file__).parent / ".cache"))
+CACHE_TTL = int(os.environ.get("DASHBOARD_CACHE_TTL", 6 * 60 * 60))
+CACHE_MAX_BYTES = int(os.environ.get("DASHBOARD_CACHE_MAX_MB", 512)) * 1024 * 1024
+
+logger = logging.getLogger(__name__)
+
+def cache_key(file_type, year=None, event=None, unit=None):
+    parts = [file_type] + [str(p) for p in (year, event, unit) if p]
+    return "__".join(p.replace(" ", "_").replace("/", "_") for p in parts)
+
+def current_generation(key):
+    try:
+        return (CACHE_DIR / key / "CURRENT").read_text().strip() or None
+    except OSError:
+        return None
+
+def _replace_text(path, text):
+    tmp_path = path.with_name(f".{path.name}-{uuid.uuid4().hex}")
+    tmp_path.write_text(text)
+    os.replace(tmp_path, path)
+
+def read_meta(key):
+    generation = current_generation(key)
+    if generation is None:
+        return None
+    try:
+        return json.loads((CACHE_DIR / key / generation / "meta.json").read_text())
+    except (OSError, ValueError):
+        return None
+
+def is_fresh(meta, max_age=CACHE_TTL):
+    return meta is not None and (max_age is None or time.time() - meta["fetched_at"] <= max_age)
+
+def touch(key):
+    generation = current_generation(key)
+    if generation is not None:
+        try:
+            os.utime(CACHE_DIR / key / generation / "meta.json")
+        except OSError:
+            pass
+
+def _map_sheet(path):
+    # Memory-mapped read: Arrow-backed string columns (the free text, most of
+    # the bytes) keep pointing at the shared page cache. to_pandas() still
+    # copies the rest, e.g. the Int8 scores and the categoricals.
+    table = pa.ipc.open_file(pa.memory_map(str(path))).read_all()
+    return table.to_pandas()
+
+def read_frames(key, max_age=CACHE_TTL):
+    meta = read_meta(key)
+    if not is_fresh(meta, max_age):
+        return None
+
+    generation_dir = CACHE_DIR / key / meta["generation"]
+    try:
+        frames = {
+            sheet: _map_sheet(generation_dir / filename)
+            for sheet, filename in meta["sheets"].items()
+        }
+    except (OSError, ValueError, KeyError, pa.ArrowException):
+        return None
+    touch(key)
+    return frames
+
+def write_frames(key, frames, digest):
+    entry_dir = CACHE_DIR / key
+    entry_dir.mkdir(parents=True, exist_ok=True)
+    generation = f"g{time.time_ns()}-{uuid.uuid4().hex[:8]}"
+    tmp_dir = entry_dir / f".tmp-{generation}"
+    tmp_dir.mkdir()
+    meta = {"key": key, "generation": generation, "hash": digest, "fetched_at": time.time(), "sheets": {}}
+    try:
+        for i, (sheet, df) in enumerate(frames.items()):
+            filename = f"{i}.arrow"
+            # Uncompressed so the files can be memory-mapped without decoding.
+            feather.write_feather(df.reset_index(drop=True), tmp_dir / filename, compression="uncompressed")
+            meta["sheets"][sheet] = filename
+        (tmp_dir / "meta.json").write_text(json.dumps(meta))
+    except (OSError, TypeError, ValueError, pa.ArrowException) as e:
+        # e.g. a full disk, or a mixed-type object column that cannot be
+        # stored as Arrow; the frames then only live in the in-process cache.
+        logger.warning("Could not write %s to the disk cache: %s", key, e)
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+        return False
+
+    os.replace(tmp_dir, entry_dir / generation)
+    _replace_text(entry_dir / "CURRENT", generation)
+    # Older generations can go right away: processes that still have them
+    # mapped keep their pages until they switch to the new generation.
+    for old_dir in entry_dir.iterdir():
+        if old_dir.is_dir() and old_dir.name != generation and not old_dir.name.startswith("."):
+            shutil.rmtree(old_dir, ignore_errors=True)
+    evict()
+    return True
+
+def refresh(key, fetched_at=None):
+    # Content unchanged upstream: restart the TTL without rewriting the sheets.
+    # An earlier fetched_at makes the entry expire sooner, e.g. to retry a
+    # failed fetch before a full TTL has passed.
+    meta = read_meta(key)
+    if meta is None:
+        return
+    meta["fetched_at"] = time.time() if fetched_at is None else fetched_at
+    _replace_text(CACHE_DIR / key / meta["generation"] / "meta.json", json.dumps(meta))
+
+@contextmanager
+def refresh_lock(key, blocking=True):
+    # Yields True when this process should refresh key. Non-blocking callers
+    # get False while another process (or thread) is already refreshing it.
+    if fcntl is None:
+        yield True
+        return
+    entry_dir = CACHE_DIR / key
+    entry_dir.mkdir(parents=True, exist_ok=True)
+    with open(entry_dir / ".lock", "w") as lock_file:
+        try:
+            fcntl.flock(lock_file, fcntl.LOCK_EX | (0 if blocking else fcntl.LOCK_NB))
+        except BlockingIOError:
+            yield False
+            return
+        try:
+            yield True
+        finally:
+            fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+def evict(max_bytes=CACHE_MAX_BYTES):
+    if not CACHE_DIR.exists():
+        return
+    entries = []
+    total = 0
+    for entry_dir in CACHE_DIR.iterdir():
+        generation = current_generation(entry_dir.name)
+        if generation is None or not (entry_dir / generation / "meta.json").exists():
+            continue
+        size = sum(f.stat().st_size for f in entry_dir.rglob("*") if f.is_file())
+        entries.append(((entry_dir / generation / "meta.json").stat().st_mtime, size, entry_dir))
+        total += size
+
+    # Least recently used first; meta.json mtime is bumped on every hit.
+    for _, size, entry_dir in sorted(entries):
+        if total <= max_bytes:
+            break
+        shutil.rmtree(entry_dir, ignore_errors=True)
+        total -= size
@@ -0,0 +1,246 @@
+from collections import namedtuple
+from urllib.parse import urlencode, urlsplit
+import asyncio
+import binascii
+import hashlib
+import io
+import logging
+import os
+import random
+import threading
+import tempfile
+import time
+import zlib
+import requests
+from requests.adapters import HTTPAdapter
+
+# Shared HTTP client for the Apps Script backend. The contract: a GET with
+# ?file=...&year=...&event=... returns the workbook as base64 text, or a body
+# containing "File not found". Backends that can do better may honour
+# &format=raw (the xlsx bytes) or &format=gzip (gzipped xlsx); the response
+# Content-Type decides how the body is decoded, so a backend that ignores the
+# parameter and keeps sending base64 still works. A backend may also answer
+# conditional requests (e.g. &known=<sha256>) with the body "Not modified",
+# and to &since=<watermark> with only the rows after it, echoing the watermark
+# in an X-Since header and the sha256 of the full workbook in X-Content-Hash
+# (what &known= is compared with); without X-Since the body is the full workbook.
+CONNECT_TIMEOUT = float(os.environ.get("DASHBOARD_GAS_CONNECT_TIMEOUT", 5))
+READ_TIMEOUT = float(os.environ.get("DASHBOARD_GAS_READ_TIMEOUT", 90))
+MAX_RETRIES = int(os.environ.get("DASHBOARD_GAS_RETRIES", 3))
+BACKOFF_BASE = float(os.environ.get("DASHBOARD_GAS_BACKOFF", 0.5))
+BACKOFF_MAX = 10.0
+MAX_PER_HOST = int(os.environ.get("DASHBOARD_GAS_MAX_PER_HOST", 4))
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+PAYLOAD_FORMAT = os.environ.get("DASHBOARD_GAS_FORMAT", "base64")
+CHUNK_SIZE = 256 * 1024
+# Payloads up to this size are decoded into one preallocated buffer, larger
+# or unsized ones into an anonymous temp file.
+MEMORY_PAYLOAD_MAX = int(os.environ.get("DASHBOARD_GAS_MEMORY_MAX_MB", 64)) * 1024 * 1024
+
+logger = logging.getLogger(__name__)
+
+class GasError(Exception):
+    pass
+
+# since: the watermark a partial (delta) body starts after, None for a full one;
+# full_digest: the full workbook's hash sent along with a delta; received: the
+# body bytes as they came in, before base64/gzip decoding (size is after).
+GasPayload = namedtuple("GasPayload", ["file", "digest", "size", "since", "full_digest", "received"],
+                        defaults=[None, None, None])
+NOT_MODIFIED = "not-modified"
+
+class BufferReader(io.RawIOBase):
+    # Seekable read-only file over a memoryview, so pandas/openpyxl can read
+    # the decoded buffer without io.BytesIO copying it.
+    def __init__(self, view):
+        self._view = view
+        self._pos = 0
+
+    def readable(self):
+        return True
+
+    def seekable(self):
+        return True
+
+    def readinto(self, b):
+        n = min(len(b), len(self._view) - self._pos)
+        b[:n] = self._view[self._pos:self._pos + n]
+        self._pos += n
+        return n
+
+    def seek(self, offset, whence=io.SEEK_SET):
+        base = {io.SEEK_SET: 0, io.SEEK_CUR: self._pos, io.SEEK_END: len(self._view)}[whence]
+        self._pos = max(0, base + offset)
+        return self._pos
+
+    def tell(self):
+        return self._pos
+
+class PayloadWriter:
+    def __init__(self, expected_size=None):
+        self.hasher = hashlib.sha256()
+        self.size = 0
+        self.received = 0
+        if expected_size is not None and expected_size <= MEMORY_PAYLOAD_MAX:
+            self._view = memoryview(bytearray(expected_size))
+            self._file = None
+        else:
+            self._view = None
+            self._file = tempfile.TemporaryFile()
+
+    def write(self, data):
+        self.hasher.update(data)
+        end = self.size + len(data)
+        if self._view is not None and end > len(self._view):
+            # Size estimate was short (e.g. padding); move to a temp file.
+            self._file = tempfile.TemporaryFile()
+            self._file.write(self._view[:self.size])
+            self._view = None
+        if self._view is not None:
+            self._view[self.size:end] = data
+        else:
+            self._file.write(data)
+        self.size = end
+
+    def payload(self, since=None, full_digest=None):
+        if self._view is not None:
+            file = BufferReader(self._view[:self.size])
+        else:
+            self._file.seek(0)
+            file = self._file
+        return GasPayload(file, self.hasher.hexdigest(), self.size, since, full_digest, self.received)
+
+def decode_base64_chunks(chunks, writer):
+    carry = b""
+    for chunk in chunks:
+        data = carry + chunk.translate(None, b" \t\r\n")
+        cut = len(data) - len(data) % 4
+        carry = data[cut:]
+        if cut:
+            writer.write(binascii.a2b_base64(memoryview(data)[:cut]))
+    if carry:
+        raise GasError("Truncated base64 payload")
+
+def decode_gzip_chunks(chunks, writer):
+    decompressor = zlib.decompressobj(16 + zlib.MAX_WBITS)
+    for chunk in chunks:
+        writer.write(decompressor.decompress(chunk))
+    writer.write(decompressor.flush())
+
+def decoded_size(response, body_format):
+    length = response.headers.get("Content-Length")
+    if length is None or "Content-Encoding" in response.headers:
+        return None
+    if body_format == "base64":
+        return int(length) * 3 // 4
+    if body_format == "raw":
+        return int(length)
+    return None
+
+def body_format(response):
+    content_type = response.headers.get("Content-Type", "").split(";")[0].strip()
+    if content_type in ("application/gzip", "application/x-gzip"):
+        return "gzip"
+    if content_type.startswith("text/") or not content_type:
+        return "base64"
+    return "raw"
+
+class GasClient:
+    def __init__(self, base_url, connect_timeout=CONNECT_TIMEOUT, read_timeout=READ_TIMEOUT,
+                 retries=MAX_RETRIES, backoff=BACKOFF_BASE, max_per_host=MAX_PER_HOST):
+        self.base_url = base_url
+        self.timeout = (connect_timeout, read_timeout)
+        self.retries = retries
+        self.backoff = backoff
+        self.max_per_host = max_per_host
+
+        # Keep-alive pool sized to the per-host cap; Apps Script redirects to
+        # googleusercontent.com, which gets its own pool and its own cap.
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=4, pool_maxsize=max_per_host)
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
+
+        self._slots = {}
+        self._slots_lock = threading.Lock()
+
+    def _slot(self, url):
+        host = urlsplit(url).netloc
+        with self._slots_lock:
+            if host not in self._slots:
+                self._slots[host] = threading.BoundedSemaphore(self.max_per_host)
+            return self._slots[host]
+
+    def _sleep_before_retry(self, attempt):
+        # Exponential backoff with full jitter.
+        time.sleep(random.uniform(0, min(BACKOFF_MAX, self.backoff * 2 ** attempt)))
+
+    def url_for(self, file_type, year=None, event=None, unit=None, **extra):
+        params = {"file": file_type}
+        if year: params["year"] = year
+        if event: params["event"] = event
+        if unit: params["unit"] = unit
+        if PAYLOAD_FORMAT != "base64": params["format"] = PAYLOAD_FORMAT
+        params.update((name, value) for name, value in extra.items() if value)
+        return self.base_url + "?" + urlencode(params)
+
+    def _download(self, response):
+        fmt = body_format(response)
+        chunks = response.iter_content(CHUNK_SIZE)
+        first = next(chunks, b"")
+        if fmt == "base64" and b"File not found" in first:
+            return None
+        if fmt == "base64" and first.startswith(b"Not modified"):
+            return NOT_MODIFIED
+
+        writer = PayloadWriter(decoded_size(response, fmt))
+        body = _counted(_prepend(first, chunks), writer)
+        if fmt == "base64":
+            decode_base64_chunks(body, writer)
+        elif fmt == "gzip":
+            decode_gzip_chunks(body, writer)
+        else:
+            for chunk in body:
+                writer.write(chunk)
+        return writer.payload(since=response.headers.get("X-Since"),
+                              full_digest=response.headers.get("X-Content-Hash"))
+
+    def fetch(self, file_type, year=None, event=None, unit=None, **extra):
+        # Returns a GasPayload whose file is positioned at the start of the
+        # xlsx bytes, NOT_MODIFIED, or None when the backend has no such file.
+        url = self.url_for(file_type, year, event, unit, **extra)
+        for attempt in range(self.retries + 1):
+            try:
+                with self._slot(url), self.session.get(url, timeout=self.timeout, stream=True) as response:
+                    if response.status_code not in RETRY_STATUSES:
+                        return self._download(response) if response.ok else None
+                    error = GasError(f"HTTP {response.status_code} from {urlsplit(url).netloc}")
+            except (requests.ConnectionError, requests.Timeout, requests.exceptions.ChunkedEncodingError) as e:
+                error = GasError(str(e))
+
+            if attempt < self.retries:
+                logger.warning("Apps Script request failed (%s), retry %d/%d", error, attempt + 1, self.retries)
+                self._sleep_before_retry(attempt)
+        raise error
+
+    async def afetch(self, file_type, year=None, event=None, unit=None, **extra):
+        # requests is blocking; run it on the default executor. The per-host
+        # semaphore still bounds how many of these hit the backend at once.
+        return await asyncio.to_thread(self.fetch, file_type, year, event, unit, **extra)
+
+    async def afetch_many(self, requests_params):
+        # requests_params: iterable of dicts with fetch() keyword arguments.
+        return await asyncio.gather(*(self.afetch(**params) for params in requests_params))
+
+    def fetch_many(self, requests_params):
+        return asyncio.run(self.afetch_many(requests_params))
+
+def _prepend(first, chunks):
+    if first:
+        yield first
+    yield from chunks
+
+def _counted(chunks, writer):
+    for chunk in chunks:
+        writer.received += len(chunk)
+        yield chunk
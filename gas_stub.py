@@ -0,0 +1,69 @@
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from urllib.parse import parse_qsl, urlsplit
+import argparse
+import base64
+import gzip
+import hashlib
+import random
+import time
+from data_sources import workbook_path
+
+# Local stand-in for the Apps Script endpoint, for development and for
+# exercising gas_client against slow or failing responses:
+#   python gas_stub.py ./local_data --port 8765 --delay 0.5 --fail-rate 0.2
+#   DASHBOARD_GAS_URL=http://127.0.0.1:8765/exec streamlit run dashboard.py
+# Files are looked up as <root>/archive.xlsx and <root>/data/<year>/<event>.xlsx,
+# the layout DASHBOARD_RECORD_DIR fills, so a recorded session can be replayed:
+#   DASHBOARD_RECORD_DIR=./recorded streamlit run dashboard.py
+#   python gas_stub.py ./recorded --port 8765
+#   DASHBOARD_SOURCE=http://127.0.0.1:8765/exec streamlit run dashboard.py
+# Requests with &format=raw or &format=gzip get binary bodies instead of base64,
+# and &known=<sha256 of the file> is answered with "Not modified".
+
+def make_handler(root, delay=0.0, fail_rate=0.0):
+    class GasStubHandler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            if delay:
+                time.sleep(delay)
+            if fail_rate and random.random() < fail_rate:
+                self.send_error(503)
+                return
+
+            params = dict(parse_qsl(urlsplit(self.path).query))
+            path = workbook_path(root, params.get("file"), params.get("year"), params.get("event"))
+            if not path.is_file():
+                body, content_type = b"File not found", "text/plain; charset=utf-8"
+            elif params.get("known") == hashlib.sha256(path.read_bytes()).hexdigest():
+                body, content_type = b"Not modified", "text/plain; charset=utf-8"
+            elif params.get("format") == "raw":
+                body, content_type = path.read_bytes(), "application/octet-stream"
+            elif params.get("format") == "gzip":
+                body, content_type = gzip.compress(path.read_bytes()), "application/gzip"
+            else:
+                body, content_type = base64.b64encode(path.read_bytes()), "text/plain; charset=utf-8"
+
+            self.send_response(200)
+            self.send_header("Content-Type", content_type)
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, format, *args):
+            pass
+
+    return GasStubHandler
+
+def serve(root, host="127.0.0.1", port=8765, delay=0.0, fail_rate=0.0):
+    server = ThreadingHTTPServer((host, port), make_handler(Path(root), delay, fail_rate))
+    server.serve_forever()
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Serve local workbooks with the Apps Script contract.")
+    parser.add_argument("root")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--delay", type=float, default=0.0, help="seconds to wait before each response")
+    parser.add_argument("--fail-rate", type=float, default=0.0, help="fraction of requests answered with 503")
+    args = parser.parse_args()
+    serve(args.root, args.host, args.port, args.delay, args.fail_rate)
@@ -0,0 +1,197 @@
+from collections import Counter
+from contextlib import contextmanager, nullcontext
+from functools import wraps
+import json
+import logging
+import os
+import threading
+import time
+import streamlit as st
+
+# Opt-in timing of the hot path. With DASHBOARD_INSTRUMENT unset the
+# decorators hand back the undecorated function and span() a shared no-op
+# context, so production reruns pay nothing for it.
+#
+# Each script run collects its own breakdown (start_run/finish_run in
+# dashboard.py); work done outside a run, e.g. by the warm-up threads, only
+# counts towards the process totals. Finished runs are appended as JSON lines
+# to DASHBOARD_METRICS_LOG, and ?admin=<DASHBOARD_ADMIN_TOKEN> shows them in
+# the sidebar.
+ENABLED = os.environ.get("DASHBOARD_INSTRUMENT", "").lower() in ("1", "true", "yes")
+ADMIN_TOKEN = os.environ.get("DASHBOARD_ADMIN_TOKEN")
+METRICS_LOG = os.environ.get("DASHBOARD_METRICS_LOG")
+
+logger = logging.getLogger(__name__)
+
+_local = threading.local()
+_lock = threading.Lock()
+_totals = {"runs": 0, "timings": {}, "counters": Counter()}
+_NO_SPAN = nullcontext()
+
+def _new_run(label):
+    return {"label": label, "started": time.time(), "timings": {}, "counters": Counter()}
+
+def _add_timing(timings, name, seconds):
+    calls, total = timings.get(name, (0, 0.0))
+    timings[name] = (calls + 1, total + seconds)
+
+def record(name, seconds):
+    run = getattr(_local, "run", None)
+    if run is not None:
+        _add_timing(run["timings"], name, seconds)
+    with _lock:
+        _add_timing(_totals["timings"], name, seconds)
+
+def count(name, n=1):
+    if not ENABLED:
+        return
+    run = getattr(_local, "run", None)
+    if run is not None:
+        run["counters"][name] += n
+    with _lock:
+        _totals["counters"][name] += n
+
+@contextmanager
+def _span(name):
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        record(name, time.perf_counter() - start)
+
+def span(name):
+    return _span(name) if ENABLED else _NO_SPAN
+
+def timed(name=None):
+    def decorate(fn):
+        if not ENABLED:
+            return fn
+        label = name or fn.__name__
+
+        @wraps(fn)
+        def wrapper(*args, **kwargs):
+            with _span(label):
+                return fn(*args, **kwargs)
+        return wrapper
+    return decorate
+
+def cached(name):
+    # Outside a memoized loader: every lookup, hit or miss.
+    def decorate(fn):
+        if not ENABLED:
+            return fn
+
+        @wraps(fn)
+        def wrapper(*args, **kwargs):
+            count(f"cache.{name}.calls")
+            with _span(name):
+                return fn(*args, **kwargs)
+        return wrapper
+    return decorate
+
+def miss(name):
+    # Inside the memoized function: only runs when the cache is filled.
+    def decorate(fn):
+        if not ENABLED:
+            return fn
+
+        @wraps(fn)
+        def wrapper(*args, **kwargs):
+            count(f"cache.{name}.misses")
+            with _span(f"{name} (miss)"):
+                return fn(*args, **kwargs)
+        return wrapper
+    return decorate
+
+def section(name):
+    # Timed as a span inside a full rerun; when Streamlit reruns just this
+    # fragment there is no run yet, so it records and logs its own.
+    def decorate(fn):
+        if not ENABLED:
+            return fn
+
+        @wraps(fn)
+        def wrapper(*args, **kwargs):
+            if getattr(_local, "run", None) is not None:
+                with _span(name):
+                    return fn(*args, **kwargs)
+            run = start_run(name)
+            try:
+                with _span(name):
+                    return fn(*args, **kwargs)
+            finally:
+                finish_run(run)
+        return wrapper
+    return decorate
+
+def start_run(label="rerun"):
+    if not ENABLED:
+        return None
+    _local.run = _new_run(label)
+    return _local.run
+
+def finish_run(run):
+    if run is None:
+        return None
+    _local.run = None
+    run["seconds"] = time.time() - run["started"]
+    with _lock:
+        _totals["runs"] += 1
+    report = snapshot(run)
+    if METRICS_LOG:
+        try:
+            with open(METRICS_LOG, "a") as log_file:
+                log_file.write(json.dumps(report) + "\n")
+        except OSError:
+            logger.warning("Could not write metrics to %s", METRICS_LOG, exc_info=True)
+    return report
+
+def cache_stats(counters):
+    stats = {}
+    for key, n in counters.items():
+        if key.startswith("cache."):
+            name, kind = key[len("cache."):].rsplit(".", 1)
+            stats.setdefault(name, {"calls": 0, "misses": 0})[kind] = n
+    for entry in stats.values():
+        entry["hits"] = max(0, entry["calls"] - entry["misses"])
+    return stats
+
+def snapshot(run=None):
+    # JSON-ready breakdown of one run, or of the whole process when None.
+    if run is None:
+        with _lock:
+            source = {"runs": _totals["runs"], "timings": dict(_totals["timings"]),
+                      "counters": Counter(_totals["counters"])}
+        report = {"scope": "process", "runs": source["runs"]}
+    else:
+        source = run
+        report = {"scope": "run", "label": run["label"], "started": run["started"], "seconds": run.get("seconds")}
+    report["timings"] = {name: {"calls": calls, "seconds": round(total, 6)}
+                         for name, (calls, total) in sorted(source["timings"].items(), key=lambda item: -item[1][1])}
+    report["caches"] = cache_stats(source["counters"])
+    report["counters"] = {name: n for name, n in source["counters"].items() if not name.startswith("cache.")}
+    return report
+
+def is_admin():
+    return ENABLED and bool(ADMIN_TOKEN) and st.query_params.get("admin") == ADMIN_TOKEN
+
+def render_panel(report):
+    if report is None or not is_admin():
+        return
+    with st.sidebar:
+        st.subheader("Performance")
+        st.caption(f"Last rerun: {report['seconds'] * 1000:.0f} ms")
+        st.dataframe(
+            [{"stage": name, "calls": t["calls"], "ms": round(t["seconds"] * 1000, 1)}
+             for name, t in report["timings"].items()],
+            hide_index=True, use_container_width=True,
+        )
+        if report["caches"]:
+            st.dataframe(
+                [{"cache": name, **stats} for name, stats in report["caches"].items()],
+                hide_index=True, use_container_width=True,
+            )
+        for name, n in report["counters"].items():
+            st.caption(f"{name}: {n:,}")
+        st.download_button("Process metrics (JSON)", json.dumps(snapshot(), indent=2),
+                           file_name="dashboard-metrics.json", mime="application/json")
@@ -0,0 +1,284 @@
+import streamlit as st
+import instrument
+from assets import data_uri
+
+# HTML cards and Altair charts. altair and pandas are imported inside the
+# chart builders so pages that only show cards do not pay for them.
+
+def make_metric_card(title, value, delta=None, icon="📊", color="#2a9d8f", big=False):
+    delta_color = "gray"
+    if delta is not None:
+        delta_color = "green" if delta > 0 else "red" if delta < 0 else "gray"
+        delta = f"{delta:+.2f}"
+    else:
+        delta = "N/A"
+
+    font_size = "40px" if big else "28px"
+
+    html = f"""
+    <div style="
+        background-color: #f8f9fa;
+        padding: 20px;
+        border-radius: 12px;
+        text-align: center;
+        box-shadow: 0 4px 6px rgba(0, 0, 0, 0.05);
+    ">
+        <div style="font-size: 26px;">{icon}</div>
+        <div style="font-weight: bold; font-size: 20px; margin-top: 5px;">{title}</div>
+        <div style="font-size: {font_size}; color: {color}; margin: 5px 0;">{value}</div>
+        {f'<div style="font-size: 14px; color: {delta_color};">Δ {delta}</div>' if not big else ''}
+    </div>
+    """
+    return html
+
+@instrument.timed()
+def altair_barh_percent(df, column, distribution=None):
+    import altair as alt
+    if distribution is None:
+        from scoring import value_distribution
+        distribution = value_distribution(df[column])
+
+    plot_df = distribution['Persentase (%)'].reset_index()
+    plot_df.columns = ['Kategori', 'Persentase (%)']
+
+    chart = alt.Chart(plot_df).mark_bar().encode(
+        x=alt.X('Persentase (%):Q', axis=None),
+        y=alt.Y('Kategori:N', sort='-x', axis=alt.Axis(title=None, labelLimit=200, labelAlign='right')),
+        color=alt.value('#2B7CD1'),
+        tooltip=['Kategori:N', 'Persentase (%):Q']
+    ).properties(
+        width=250,
+        height=400
+    )
+
+    text = alt.Chart(plot_df).transform_calculate(
+        Label="format(datum['Persentase (%)'], '.2~f') + '%'"
+    ).mark_text(
+        align="left",
+        baseline="middle",
+        dx=3,
+        color="grey"
+    ).encode(
+        x='Persentase (%):Q',
+        y=alt.Y('Kategori:N', sort='-x'),
+        text='Label:N'
+    )
+
+    return chart + text
+
+def trend_chart(df_window, unit):
+    # CSI/CLI lines with an NPS bar per period. Each layer gets its own
+    # pre-split data instead of a client-side transform_filter.
+    import altair as alt
+    import pandas as pd
+    df_window = df_window.copy()
+    for col in ["CSI", "CLI", "NPS"]:
+        df_window[col] = pd.to_numeric(df_window[col], errors='coerce')
+    df_window["Event_Year"] = df_window["Event"].astype(str) + " " + df_window["Tahun"].astype(str)
+
+    df_long = pd.melt(df_window,
+                    id_vars=["Event_Year", "Tahun", "Event"],
+                    value_vars=["CSI", "CLI", "NPS"],
+                    var_name="Metric",
+                    value_name="Score")
+    by_metric = {metric: rows for metric, rows in df_long.groupby("Metric", sort=False)}
+
+    color_scale = alt.Scale(
+        domain=["CSI", "CLI", "NPS"],
+        range=["#1f77b4", "#ff7f0e", "#98c379"]
+    )
+    x = alt.X("Event_Year:N", title="", sort=df_window["Event_Year"].tolist(),
+              axis=alt.Axis(labelAngle=0))
+
+    # line CSI & CLI
+    line = alt.Chart(df_long[df_long["Metric"] != "NPS"]).mark_line(point=True).encode(
+        x=x,
+        y=alt.Y("Score:Q", title="Score (%)"),
+        color=alt.Color("Metric:N", scale=color_scale, legend=alt.Legend(title="Metric", orient="bottom")),
+        tooltip=["Tahun", "Event", "Metric", "Score"]
+    )
+
+    # bar NPS
+    bar = alt.Chart(by_metric["NPS"]).mark_bar(size=40).encode(
+        x=x,
+        y="Score:Q",
+        color=alt.Color("Metric:N", scale=color_scale, legend=None),
+        tooltip=["Tahun", "Event", "Metric", "Score"]
+    )
+
+    # text
+    text_csi = alt.Chart(by_metric["CSI"]).mark_text(align='center', dy=-15, color="#1f77b4").encode(
+        x=x, y="Score:Q", text="Score:Q"
+    )
+    text_cli = alt.Chart(by_metric["CLI"]).mark_text(align='center', dy=15, color="#ff7f0e").encode(
+        x=x, y="Score:Q", text="Score:Q"
+    )
+    text_nps = alt.Chart(by_metric["NPS"]).mark_text(align='center', dy=-5, color="black").encode(
+        x=x, y="Score:Q", text="Score:Q"
+    )
+
+    # combine
+    return alt.layer(bar, line, text_csi, text_cli, text_nps).properties(
+        title=alt.TitleParams(
+            text=f"CSI/CLI/NPS - {unit}",
+            fontSize=20,
+            anchor='middle'
+        ),
+        width=550,
+        height=350
+    )
+
+def nps_distribution_chart(df_window, unit):
+    import altair as alt
+    import pandas as pd
+    df_window = df_window.copy()
+    for col in ["Detractor", "Passive", "Promoter", "NPS"]:
+        df_window[col] = pd.to_numeric(df_window[col], errors='coerce')
+
+    df_window["Event_Year"] = df_window["Event"].astype(str) + " " + df_window["Tahun"].astype(str)
+    df_window = df_window.sort_values(by=["Tahun", "Event"], ascending=[False, False]).reset_index(drop=True)
+    df_window["Index"] = df_window.index
+
+    nps_long = df_window.melt(
+        id_vars=["Event_Year", "Index"],
+        value_vars=["Detractor", "Passive", "Promoter"],
+        var_name="Kategori",
+        value_name="Persentase"
+    )
+
+    color_scale = alt.Scale(
+        domain=["Detractor", "Passive", "Promoter"],
+        range=["#EA4335", "#FFD966", "#73B855"]
+    )
+    y_sort = alt.EncodingSortField(field="Index", order="descending")
+
+    bar = alt.Chart(nps_long).mark_bar().encode(
+        y=alt.Y("Event_Year:N", title="", axis=alt.Axis(labelAngle=0, grid=False), sort=y_sort),
+        x=alt.X("Persentase:Q", stack="zero", title=None, scale=alt.Scale(domain=[0, 100])),
+        color=alt.Color("Kategori:N", scale=color_scale, legend=None),
+        tooltip=["Event_Year", "Kategori", "Persentase"]
+    )
+
+    # Label dalam bar (< 5)
+    bar_text_outside = alt.Chart(nps_long[nps_long["Persentase"] < 5]).mark_text(
+        align='center',
+        baseline='middle',
+        color='#393737',
+        fontSize=11
+    ).encode(
+        y=alt.Y("Event_Year:N", sort=y_sort),
+        x=alt.X("Persentase:Q", stack="center"),
+        text=alt.Text("Persentase:Q", format=".1f")
+    )
+
+    # Label di luar bar (>= 5)
+    bar_text_inside = alt.Chart(nps_long[nps_long["Persentase"] >= 5]).mark_text(
+        align='right',
+        baseline='middle',
+        dx=-5,
+        color='#393737',
+        fontSize=11
+    ).encode(
+        y=alt.Y("Event_Year:N", sort=y_sort),
+        x=alt.X("Persentase:Q", stack="zero"),
+        text=alt.Text("Persentase:Q", format=".1f")
+    )
+
+    return (bar + bar_text_inside + bar_text_outside).properties(
+        width=550,
+        height=350,
+        title=alt.TitleParams(
+            text=f"Distribusi NPS - {unit}",
+            fontSize=20,
+            anchor='middle'
+        )
+    ).configure_axis(
+        labelFontSize=12,
+        titleFontSize=14,
+        grid=False
+    )
+
+# Finished Vega-Lite specs per selection. The archive generation is part of
+# the key, so a sync that changes the archive also invalidates the charts.
+@instrument.cached("trend_chart_spec")
+@st.cache_data(max_entries=256)
+@instrument.miss("trend_chart_spec")
+def trend_chart_spec(year, event, unit, generation):
+    from data import load_archive, load_archive_index, select_data
+    df1, _ = load_archive()
+    index1, _ = load_archive_index()
+    df_window = select_data(df1, year, event, unit, index=index1)
+    if df_window.empty:
+        return None
+    chart = trend_chart(df_window, unit)
+    with instrument.span("altair.to_dict"):
+        return chart.to_dict()
+
+@instrument.cached("nps_chart_spec")
+@st.cache_data(max_entries=256)
+@instrument.miss("nps_chart_spec")
+def nps_chart_spec(year, event, unit, generation):
+    from data import load_archive, load_archive_index, select_data
+    _, df2 = load_archive()
+    _, index2 = load_archive_index()
+    df_window = select_data(df2, year, event, unit, index=index2)
+    if df_window.empty:
+        return None
+    chart = nps_distribution_chart(df_window, unit)
+    with instrument.span("altair.to_dict"):
+        return chart.to_dict()
+
+def comparison_heatmap(table):
+    # Unit x period grid per metric from load_comparison, each cell labelled
+    # with its score and the change from the same event a year earlier.
+    import altair as alt
+    table = table.copy()
+    table["Periode"] = table["Event"].astype(str) + " " + table["Tahun"].astype(str)
+    delta = table["Delta"].map(lambda d: "" if d != d else f"\n{d:+.1f}")
+    table["Label"] = table["Score"].map(lambda v: "-" if v != v else f"{v:.1f}") + delta
+
+    periods = table["Periode"].unique().tolist()
+    units = table["Unit"].unique().tolist()
+    x = alt.X("Periode:N", sort=periods, title=None, axis=alt.Axis(labelAngle=0, orient="top"))
+    y = alt.Y("Unit:N", sort=units, title=None)
+
+    cells = alt.Chart().mark_rect().encode(
+        x=x,
+        y=y,
+        color=alt.Color("Score:Q", scale=alt.Scale(scheme="redyellowgreen"), legend=None),
+        tooltip=["Unit", "Periode", "Metric", alt.Tooltip("Score:Q", format=".1f"),
+                 alt.Tooltip("Delta:Q", format="+.1f"), "Respondents:Q"]
+    )
+    labels = alt.Chart().mark_text(lineBreak="\n", fontSize=12, color="#2d3436").encode(
+        x=x, y=y, text="Label:N"
+    )
+    return alt.layer(cells, labels, data=table).properties(
+        width=max(300, 90 * len(periods)),
+        height=45 * len(units)
+    ).facet(
+        row=alt.Row("Metric:N", sort=["CSI", "CLI", "NPS"], title=None,
+                    header=alt.Header(labelFontSize=16, labelFontWeight="bold", labelAngle=0))
+    ).resolve_scale(color="independent")
+
+def sentiment_card(color, label, count, percentage):
+    return f"""
+    <div style='
+        background-color: #ffffff;
+        border-left: 6px solid {color};
+        border-radius: 12px;
+        padding: 12px 16px;
+        box-shadow: 0px 4px 10px rgba(0, 0, 0, 0.05);
+        text-align: center;
+        height: 120px;
+        display: flex;
+        flex-direction: column;
+        justify-content: center;
+    '>
+        <div style='margin-bottom: 4px; font-weight: 600; color: {color}; font-size: 18px;'>{label}</div>
+        <div style='font-size: 28px; font-weight: bold; color: #2d3436;'>{count}</div>
+        <div style='font-size: 14px; color: gray;'>{percentage:.1%}</div>
+    </div>
+    """
+
+def img_to_base64(path):
+    return data_uri(path)
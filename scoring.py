@@ -0,0 +1,200 @@
+import numpy as np
+import pandas as pd
+import instrument
+
+# Survey statistics on respondent frames: the CSI/CLI/NPS scores (scalar and
+# vectorized over groups) and the demographic distributions.
+
+@instrument.timed()
+def calculate_scores(df):
+    result = {
+        "CSI Score (%)": None,
+        "CLI Score (%)": None,
+        "NPS Score (%)": None,
+        "Score 0-6 (Detractor) (%)": None,
+        "Score 7-8 (Passive) (%)": None,
+        "Score 9-10 (Promoter) (%)": None,
+        }
+    
+    if "CSI" in df.columns:
+        df_csi = df["CSI"].dropna()
+        if not df_csi.empty:
+            csi_counts = df_csi.value_counts()
+            total_rows = len(df_csi)
+            csi_proportion = csi_counts / total_rows
+            sum_5_4 = csi_proportion.get(5, 0) + csi_proportion.get(4, 0)
+            result["CSI Score (%)"] = round(sum_5_4 * 100, 1)
+
+    if "CLI" in df.columns:
+        df_cli = df["CLI"].dropna()
+        if not df_cli.empty:
+            avg_cli = df_cli.mean()
+            if (df_cli > 5).any():
+                result["CLI Score (%)"] = round((avg_cli - 1) / 9 * 100, 1)
+            else:
+                result["CLI Score (%)"] = round((avg_cli - 1) / 4 * 100, 1)
+
+    if "NPS" in df.columns:
+        df_nps = df["NPS"].dropna()
+        if not df_nps.empty:
+            nps_counts = df_nps.value_counts()
+            total_rows = len(df_nps)
+            nps_proportion = nps_counts / total_rows
+
+            sum_0_6 = sum(nps_proportion.get(i, 0) for i in range(0, 7)) * 100  # Detractor
+            sum_7_8 = sum(nps_proportion.get(i, 0) for i in range(7, 9)) * 100  # Passive
+            sum_9_10 = sum(nps_proportion.get(i, 0) for i in range(9, 11)) * 100  # Promoter
+
+            result["Score 0-6 (Detractor) (%)"] = round(sum_0_6, 1)
+            result["Score 7-8 (Passive) (%)"] = round(sum_7_8, 1)
+            result["Score 9-10 (Promoter) (%)"] = round(sum_9_10, 1)
+            result["NPS Score (%)"] = round(sum_9_10 - sum_0_6, 1)
+
+    return result
+
+# Score names as returned by calculate_scores, mapped to the archive sheet
+# columns so score cube rows line up with df1/df2.
+CUBE_COLUMNS = {
+    "CSI Score (%)": "CSI",
+    "CLI Score (%)": "CLI",
+    "NPS Score (%)": "NPS",
+    "Score 0-6 (Detractor) (%)": "Detractor",
+    "Score 7-8 (Passive) (%)": "Passive",
+    "Score 9-10 (Promoter) (%)": "Promoter",
+}
+
+def _value_matrix(values, valid, codes, n_groups, n_values=11):
+    # Per-group counts of the integer values 0..n_values-1 in one bincount.
+    hit = valid & (values == np.floor(values)) & (values >= 0) & (values < n_values)
+    flat = codes[hit] * n_values + values[hit].astype(np.int64)
+    return np.bincount(flat, minlength=n_groups * n_values).reshape(n_groups, n_values)
+
+def score_groups(df, codes, n_groups):
+    # Vectorized calculate_scores: codes maps each row of df to a group in
+    # range(n_groups). Proportions are summed in the same order as the scalar
+    # version so the rounded results match it exactly.
+    result = {key: np.full(n_groups, np.nan) for key in CUBE_COLUMNS}
+
+    def column(name):
+        series = df[name]
+        valid = series.notna().to_numpy()
+        values = pd.to_numeric(series, errors="coerce").to_numpy(dtype="float64", na_value=np.nan)
+        total = np.bincount(codes[valid], minlength=n_groups)
+        return values, valid, total
+
+    with np.errstate(invalid="ignore", divide="ignore"):
+        if "CSI" in df.columns:
+            values, valid, total = column("CSI")
+            proportion = _value_matrix(values, valid, codes, n_groups) / total[:, None]
+            sum_5_4 = proportion[:, 5] + proportion[:, 4]
+            result["CSI Score (%)"] = np.where(total > 0, np.round(sum_5_4 * 100, 1), np.nan)
+
+        if "CLI" in df.columns:
+            values, valid, total = column("CLI")
+            avg_cli = np.bincount(codes[valid], weights=values[valid], minlength=n_groups) / total
+            ten_point = np.bincount(codes[valid], weights=(values[valid] > 5).astype(float), minlength=n_groups) > 0
+            cli = np.where(ten_point, (avg_cli - 1) / 9 * 100, (avg_cli - 1) / 4 * 100)
+            result["CLI Score (%)"] = np.where(total > 0, np.round(cli, 1), np.nan)
+
+        if "NPS" in df.columns:
+            values, valid, total = column("NPS")
+            proportion = _value_matrix(values, valid, codes, n_groups) / total[:, None]
+            sums = []
+            for lo, hi in ((0, 7), (7, 9), (9, 11)):
+                acc = np.zeros(n_groups)
+                for i in range(lo, hi):
+                    acc = acc + proportion[:, i]
+                sums.append(acc * 100)
+            sum_0_6, sum_7_8, sum_9_10 = sums
+            has_nps = total > 0
+            result["Score 0-6 (Detractor) (%)"] = np.where(has_nps, np.round(sum_0_6, 1), np.nan)
+            result["Score 7-8 (Passive) (%)"] = np.where(has_nps, np.round(sum_7_8, 1), np.nan)
+            result["Score 9-10 (Promoter) (%)"] = np.where(has_nps, np.round(sum_9_10, 1), np.nan)
+            result["NPS Score (%)"] = np.where(has_nps, np.round(sum_9_10 - sum_0_6, 1), np.nan)
+
+    return result
+
+def calculate_scores_grouped(df, by):
+    # calculate_scores for every group of df.groupby(by) in one vectorized
+    # pass; returns one row per group with the grouping columns first.
+    by = [by] if isinstance(by, str) else list(by)
+    grouped = df.groupby(by, dropna=False, observed=True, sort=True)
+    codes = grouped.ngroup().to_numpy()
+    groups = grouped.size().index.to_frame(index=False)
+
+    scores = score_groups(df, codes, len(groups))
+    return pd.concat([groups, pd.DataFrame(scores)], axis=1)
+
+@instrument.timed()
+def build_score_cube(frames_by_slice):
+    # frames_by_slice: {(Tahun, Event, Unit): respondent frame}. All slices are
+    # scored together in one pass over the concatenated rows.
+    slices = [key for key, df in frames_by_slice.items() if df is not None]
+    index = pd.MultiIndex.from_tuples(slices, names=["Tahun", "Event", "Unit"])
+    if not slices:
+        return pd.DataFrame(columns=list(CUBE_COLUMNS.values()) + ["Respondents"], index=index)
+
+    frames = [frames_by_slice[key] for key in slices]
+    codes = np.repeat(np.arange(len(frames)), [len(df) for df in frames])
+    rows = pd.concat(frames, ignore_index=True)
+    scores = score_groups(rows, codes, len(frames))
+
+    cube = pd.DataFrame({CUBE_COLUMNS[key]: values for key, values in scores.items()}, index=index)
+    if "CSI" in rows.columns:
+        cube["Respondents"] = np.bincount(codes[rows["CSI"].notna().to_numpy()], minlength=len(frames))
+    else:
+        cube["Respondents"] = 0
+    return cube
+
+COMPARE_METRICS = ["CSI", "CLI", "NPS"]
+
+def comparison_table(cube, years):
+    # Long form of a score cube for the comparison view: one row per slice and
+    # metric, with the same event and unit a year earlier (when the cube has
+    # it) as Previous/Delta. Only the requested years are returned.
+    long = cube[COMPARE_METRICS + ["Respondents"]].reset_index().melt(
+        id_vars=["Tahun", "Event", "Unit", "Respondents"], value_vars=COMPARE_METRICS,
+        var_name="Metric", value_name="Score")
+    previous = long[["Tahun", "Event", "Unit", "Metric", "Score"]].rename(columns={"Score": "Previous"})
+    previous["Tahun"] = previous["Tahun"] + 1
+    long = long.merge(previous, on=["Tahun", "Event", "Unit", "Metric"], how="left")
+    long["Delta"] = long["Score"] - long["Previous"]
+    return long[long["Tahun"].isin([int(year) for year in years])].reset_index(drop=True)
+
+DEMOGRAPHIC_COLUMNS = ['Domisili', 'Usia', 'Companions']
+# Categories beyond the top N are folded into one bucket so high-cardinality
+# columns such as Domisili keep chart payloads small.
+DISTRIBUTION_TOP_N = 15
+OTHER_LABEL = 'Lainnya'
+
+def value_distribution(series, top_n=None):
+    # Counts (incl. missing) and percentages of one column, largest first.
+    if isinstance(series.dtype, pd.CategoricalDtype):
+        # Code -1 (missing) lands in slot 0.
+        bins = np.bincount(series.cat.codes.to_numpy() + 1, minlength=len(series.cat.categories) + 1)
+        counts = pd.Series(bins, index=[np.nan] + list(series.cat.categories))
+        counts = counts[counts > 0].sort_values(ascending=False, kind='stable')
+    else:
+        counts = series.value_counts(dropna=False)
+
+    if top_n is not None and len(counts) > top_n:
+        top, rest = counts.iloc[:top_n].copy(), counts.iloc[top_n:].sum()
+        if OTHER_LABEL in top.index:
+            # 'Lainnya' is also a common answer: fold the overflow into it
+            # instead of adding a second bar with the same label.
+            top.loc[OTHER_LABEL] += rest
+            counts = top.sort_values(ascending=False, kind='stable')
+        else:
+            counts = pd.concat([top, pd.Series({OTHER_LABEL: rest})])
+
+    percentages = counts / counts.sum() * 100
+    return pd.DataFrame({
+        'Jumlah': counts,
+        'Persentase (%)': percentages.round(2)
+    })
+
+def distributions(df, columns=DEMOGRAPHIC_COLUMNS, top_n=DISTRIBUTION_TOP_N):
+    return {col: value_distribution(df[col], top_n) for col in columns if col in df.columns}
+
+def get_value_counts_percentage(df, column_name):
+    return value_distribution(df[column_name])
@@ -0,0 +1,96 @@
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from functools import partial
+import argparse
+import logging
+import os
+import threading
+import time
+import streamlit as st
+import utils
+from utils import YEARS, EVENTS
+
+# Opt-in warm-up of every (year, event) workbook and the archive, so the first
+# viewer of a combination never waits on the Apps Script round-trip.
+#   DASHBOARD_WARMUP=1                 warm the in-process caches at server start
+#   DASHBOARD_WARMUP_INTERVAL=<secs>   then refresh from the backend on a schedule
+#   python warmup.py [--interval N]    refresh the on-disk cache from cron/CI
+WARMUP_ENABLED = os.environ.get("DASHBOARD_WARMUP", "") not in ("", "0")
+WARMUP_INTERVAL = int(os.environ.get("DASHBOARD_WARMUP_INTERVAL", 0))
+WARMUP_WORKERS = int(os.environ.get("DASHBOARD_WARMUP_WORKERS", 4))
+WARMUP_RETRIES = int(os.environ.get("DASHBOARD_WARMUP_RETRIES", 3))
+
+logger = logging.getLogger(__name__)
+
+def with_retries(fn, *args, retries=WARMUP_RETRIES):
+    for attempt in range(retries):
+        try:
+            return fn(*args)
+        except Exception:
+            if attempt == retries - 1:
+                raise
+            time.sleep(2 ** attempt)
+
+def warm_workbook(year, event):
+    frames = utils.load_workbook(year, event)
+    for unit in frames or {}:
+        utils.load_distributions(year, event, unit)
+        utils.load_comment_index(year, event, unit)
+    utils.load_score_cube(year, event)
+    return frames
+
+def warm_up(years=YEARS, events=EVENTS, workers=WARMUP_WORKERS, force=False):
+    # force=True re-reads everything from the backend into the disk cache;
+    # otherwise the Streamlit caches used by the dashboard are filled.
+    if force:
+        archive_job = partial(utils.sync_archive, force=True)
+        workbook_job = partial(utils.read_workbook, max_age=0)
+    else:
+        archive_job, workbook_job = utils.sync_archive, warm_workbook
+
+    started = time.perf_counter()
+    failed = []
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        jobs = {pool.submit(with_retries, archive_job): ("archive",)}
+        for year in years:
+            for event in events:
+                jobs[pool.submit(with_retries, workbook_job, year, event)] = ("data", year, event)
+
+        for future in as_completed(jobs):
+            try:
+                future.result()
+            except Exception:
+                logger.exception("Warm-up failed for %s", jobs[future])
+                failed.append(jobs[future])
+
+    logger.info("Warm-up of %d workbooks finished in %.1fs (%d failed)",
+                len(jobs), time.perf_counter() - started, len(failed))
+    return failed
+
+def _run_schedule(interval):
+    warm_up()
+    while interval > 0:
+        time.sleep(interval)
+        # Publishes new disk generations; load_workbook and the caches keyed
+        # on the generation switch over on their next lookup, in this and
+        # every other process sharing the cache directory.
+        warm_up(force=True)
+        warm_up()
+
+@st.cache_resource
+def start_background_warm_up(interval=WARMUP_INTERVAL):
+    thread = threading.Thread(target=_run_schedule, args=(interval,), name="dashboard-warmup", daemon=True)
+    thread.start()
+    return thread
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Refresh the dashboard's on-disk workbook cache.")
+    parser.add_argument("--interval", type=int, default=0, help="repeat every N seconds")
+    parser.add_argument("--workers", type=int, default=WARMUP_WORKERS)
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO)
+
+    while True:
+        warm_up(workers=args.workers, force=True)
+        if args.interval <= 0:
+            break
+        time.sleep(args.interval)